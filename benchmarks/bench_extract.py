@@ -0,0 +1,69 @@
+"""Per-page scrape cost: the r.jina.ai round-trip vs a full local download vs the streaming LocalReader.
+
+    python benchmarks/bench_extract.py --pages 20 --paragraphs 2000 --max-chars 125000
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import requests
+
+from stand_ins import HtmlStandIn, JinaStandIn
+from extract import MarkdownExtractor
+from utils import JinaReader, LocalReader
+
+
+def full_download(url: str, max_chars: int) -> str:
+    # Baseline for the local backend: download the whole body, then extract and truncate.
+    extractor = MarkdownExtractor()
+    extractor.feed(requests.get(url).text)
+    return extractor.markdown()[:max_chars]
+
+
+def measure(name: str, scrape, urls: list, max_chars: int, stand_in) -> dict:
+    sent_before = getattr(stand_in, "bytes_sent", 0)
+    latencies = []
+    chars = []
+    for url in urls:
+        start = time.perf_counter()
+        chars.append(len(scrape(url, max_chars)))
+        latencies.append(time.perf_counter() - start)
+    sent = getattr(stand_in, "bytes_sent", 0) - sent_before
+    print(f"{name:<12} mean={statistics.mean(latencies) * 1000:7.1f}ms  max={max(latencies) * 1000:7.1f}ms  "
+          f"chars={statistics.mean(chars):9.0f}  bytes/page={sent / len(urls) if sent else float('nan'):10.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--paragraphs", type=int, default=2000)
+    parser.add_argument("--max-chars", type=int, default=125_000)
+    parser.add_argument("--bandwidth", type=float, default=4_000_000, help="Fixture server bytes per second")
+    parser.add_argument("--jina-latency", type=float, default=0.8, help="Simulated r.jina.ai round-trip")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    html = HtmlStandIn(paragraphs=args.paragraphs, bandwidth=args.bandwidth, latency=0.0, jitter=0.0, seed=args.seed)
+    jina = JinaStandIn(latency=args.jina_latency, jitter=0.1, seed=args.seed)
+    base_url = html.start()
+    jina_url = jina.start()
+    urls = [f"{base_url}/article-{i}" for i in range(args.pages)]
+
+    jina_reader = JinaReader(reader_url=jina_url)
+    local_reader = LocalReader()
+    measure("jina", lambda url, max_chars: jina_reader.scrape(url, max_chars=max_chars), urls, args.max_chars, jina)
+    measure("full", full_download, urls, args.max_chars, html)
+    measure("streaming", lambda url, max_chars: local_reader.scrape(url, max_chars=max_chars), urls, args.max_chars, html)
+    measure("binary", lambda url, max_chars: local_reader.scrape(url, max_chars=max_chars),
+            [f"{base_url}/file-{i}.pdf" for i in range(args.pages)], args.max_chars, html)
+
+    html.stop()
+    jina.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""End-to-end benchmark of the compiled graph against local stand-in Ollama, SearXNG and Jina servers.
+
+Runs fully offline on CPU: search goes through the `searxng` provider, scraping through the Jina stand-in,
+LLM and embedding calls through the Ollama stand-in, and FlashRank is disabled (RERANKER=none).
+
+    python benchmarks/bench_graph.py --queries 8 --concurrency 4 --save-baseline benchmarks/baseline.json
+    python benchmarks/bench_graph.py --queries 8 --concurrency 4 --baseline benchmarks/baseline.json
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from uuid import uuid4
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from stand_ins import JinaStandIn, OllamaStandIn, SearxStandIn
+
+QUERIES = [
+    "Who is the artistic director of Versace?",
+    "What are the latest results of active space debris removal missions?",
+    "How do solid-state batteries compare to lithium-ion in 2025?",
+    "What is the current state of fusion energy startups?",
+    "Which countries lead offshore wind installations?",
+    "What changed in the EU AI Act final text?",
+    "How effective are GLP-1 drugs for weight loss?",
+    "What is the status of the James Webb telescope deep field surveys?",
+]
+
+
+def percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))] if values else 0.0
+
+
+def start_stand_ins(args) -> dict:
+    stand_ins = {
+        "ollama": OllamaStandIn(seed=args.seed, failure_rate=args.llm_failure_rate),
+        "searxng": SearxStandIn(latency=args.search_latency, failure_rate=args.search_failure_rate, seed=args.seed),
+        "jina": JinaStandIn(latency=args.scrape_latency, slow_rate=args.slow_rate, failure_rate=args.scrape_failure_rate,
+                            seed=args.seed),
+    }
+    for stand_in in stand_ins.values():
+        stand_in.start()
+    return stand_ins
+
+
+def configure_environment(stand_ins: dict, cache_dir: str):
+    os.environ.update({
+        "OLLAMA_HOST": stand_ins["ollama"].url,
+        "SEARCH_API": "searxng",
+        "SEARXNG_URL": stand_ins["searxng"].url,
+        "JINA_READER_URL": stand_ins["jina"].url,
+        "RERANKER": "none",
+        # Repeated queries would be answered from memory, which is not what the benchmark measures.
+        "MEMORY": "0",
+        "DEEP_RESEARCH_CACHE_DIR": cache_dir,
+        "TRACE_PATH": "",
+    })
+
+
+def run_query(research, user_query: str) -> dict:
+    run_id = uuid4().hex
+    start = time.perf_counter()
+    error = None
+    try:
+        research(user_query, run_id=run_id)
+    except Exception as e:
+        error = repr(e)
+    return {"run_id": run_id, "query": user_query, "latency": time.perf_counter() - start, "error": error}
+
+
+def summarize(runs: list, wall: float, tracer) -> dict:
+    node_latencies = {}
+    for run in runs:
+        for row in tracer.breakdown(run["run_id"]):
+            node_latencies.setdefault(row["name"], []).append(row["total_s"])
+    latencies = [run["latency"] for run in runs]
+    return {
+        "queries": len(runs),
+        "errors": sum(1 for run in runs if run["error"]),
+        "wall_s": wall,
+        "throughput_qph": len(runs) / wall * 3600,
+        "end_to_end_s": {
+            "mean": statistics.mean(latencies),
+            "p50": percentile(latencies, 0.5),
+            "p95": percentile(latencies, 0.95),
+        },
+        "per_span_s": {
+            name: {"mean": statistics.mean(values), "p95": percentile(values, 0.95)}
+            for name, values in sorted(node_latencies.items())
+        },
+        # ru_maxrss is in kilobytes on Linux.
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> bool:
+    checks = [
+        ("end_to_end_s.p50", result["end_to_end_s"]["p50"], baseline["end_to_end_s"]["p50"], False),
+        ("end_to_end_s.p95", result["end_to_end_s"]["p95"], baseline["end_to_end_s"]["p95"], False),
+        ("throughput_qph", result["throughput_qph"], baseline["throughput_qph"], True),
+        ("peak_rss_mb", result["peak_rss_mb"], baseline["peak_rss_mb"], False),
+    ]
+    for name, stats in result["per_span_s"].items():
+        if name.startswith("node.") and name in baseline["per_span_s"]:
+            checks.append((f"{name}.mean", stats["mean"], baseline["per_span_s"][name]["mean"], False))
+    ok = True
+    print(f"\n{'metric':<32}{'baseline':>12}{'current':>12}{'change':>10}")
+    for name, current, previous, higher_is_better in checks:
+        change = (current - previous) / previous if previous else 0.0
+        regressed = change < -tolerance if higher_is_better else change > tolerance
+        ok = ok and not regressed
+        print(f"{name:<32}{previous:>12.2f}{current:>12.2f}{change:>+10.1%}{'  REGRESSION' if regressed else ''}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=len(QUERIES))
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--search-latency", type=float, default=0.3)
+    parser.add_argument("--scrape-latency", type=float, default=0.5)
+    parser.add_argument("--slow-rate", type=float, default=0.0)
+    parser.add_argument("--search-failure-rate", type=float, default=0.0)
+    parser.add_argument("--scrape-failure-rate", type=float, default=0.05)
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0)
+    parser.add_argument("--cache-dir", help="Reuse a cache directory (warm run) instead of a fresh temporary one")
+    parser.add_argument("--baseline", help="Compare against a stored baseline JSON")
+    parser.add_argument("--save-baseline", help="Write this run's results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    args = parser.parse_args()
+
+    stand_ins = start_stand_ins(args)
+    cache_dir = args.cache_dir or tempfile.mkdtemp(prefix="deep-research-bench-")
+    configure_environment(stand_ins, cache_dir)
+
+    import logging
+    from research import research
+    from tracing import tracer
+    logging.getLogger().setLevel(logging.WARNING)
+
+    queries = [QUERIES[i % len(QUERIES)] for i in range(args.queries)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        runs = list(executor.map(lambda query: run_query(research, query), queries))
+    result = summarize(runs, time.perf_counter() - start, tracer)
+    print(json.dumps(result, indent=2))
+
+    for stand_in in stand_ins.values():
+        stand_in.stop()
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(result, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            if not compare(result, json.load(f), args.tolerance):
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
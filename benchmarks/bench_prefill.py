@@ -0,0 +1,70 @@
+"""Prefill time per fan-out phase for the legacy and prefix-stable prompt layouts, with and without priming.
+
+Needs a real Ollama (OLLAMA_HOST) with the model pulled; the stand-in server has no KV cache to reuse.
+Ollama should run with OLLAMA_NUM_PARALLEL >= --fan-out for the calls to overlap.
+
+    python benchmarks/bench_prefill.py --model qwen3:14b --fan-out 5 --sources 30
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from uuid import uuid4
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from langchain_ollama import ChatOllama
+
+from stand_ins import fake_markdown
+from context import assemble_prompt
+from prompts import EVALUATOR_PROMPT
+
+
+def run_phase(llm: ChatOllama, layout: str, prime: bool, fan_out: int, summaries: str) -> dict:
+    # A fresh nonce at the start of the shared prefix makes sure nothing is reused from an earlier phase.
+    system_prompt = f"[RUN]: {uuid4().hex}\n{EVALUATOR_PROMPT}"
+    shared = ["[USER QUERY]: Summarize the findings.", f"[SUMMARIES]:\n{summaries}"]
+    prompts = [
+        assemble_prompt(system_prompt, shared=shared, variable=[f"[REPORT]: Draft number {i}."], layout=layout)
+        for i in range(fan_out)
+    ]
+    start = time.perf_counter()
+    responses = []
+    if prime:
+        responses.append(llm.model_copy(update={"num_predict": 1}).invoke(prompts[0][:1]))
+    with ThreadPoolExecutor(max_workers=fan_out) as executor:
+        responses.extend(executor.map(llm.invoke, prompts))
+    metadata = [response.response_metadata for response in responses]
+    return {
+        "wall_s": time.perf_counter() - start,
+        "prefill_s": sum(m.get("prompt_eval_duration", 0) for m in metadata) / 1e9,
+        "prefill_tokens": sum(m.get("prompt_eval_count", 0) for m in metadata),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="qwen3:14b")
+    parser.add_argument("--fan-out", type=int, default=5)
+    parser.add_argument("--sources", type=int, default=30)
+    parser.add_argument("--num-ctx", type=int, default=16384)
+    args = parser.parse_args()
+
+    summaries = "\n\n".join(
+        f"[{i + 1}] https://source{i}.example\n- " + fake_markdown(f"https://source{i}.example", paragraphs=1)[-400:]
+        for i in range(args.sources)
+    )
+    llm = ChatOllama(model=args.model, num_ctx=args.num_ctx, num_predict=8, keep_alive="30m")
+    llm.invoke("warm up")
+
+    print(f"{'layout':<8}{'priming':>9}{'wall_s':>10}{'prefill_s':>11}{'prefill_tokens':>16}")
+    for layout in ("legacy", "stable"):
+        for prime in (False, True):
+            result = run_phase(llm, layout, prime, args.fan_out, summaries)
+            print(f"{layout:<8}{str(prime):>9}{result['wall_s']:>10.2f}{result['prefill_s']:>11.2f}"
+                  f"{result['prefill_tokens']:>16}")
+
+
+if __name__ == "__main__":
+    main()
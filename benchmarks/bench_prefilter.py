@@ -0,0 +1,92 @@
+"""Recall vs latency of the BM25 prefilter: embed every chunk (PREFILTER=none) vs only the best lexical fraction.
+
+Fixture pages carry a few planted passages that answer the query; recall is the share of those passages found in
+the reranker's candidate list. Embedding is simulated at --embed-ms per chunk, roughly nomic-embed-text on a CPU.
+
+    python benchmarks/bench_prefilter.py --pages 30 --fractions 1.0 0.5 0.3 0.1
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+os.environ.setdefault("RERANKER", "none")
+os.environ.setdefault("NEAR_DUPLICATES", "0")
+
+from langchain_core.embeddings import Embeddings
+
+from stand_ins import fake_markdown, hashed_embedding, seeded_random
+from utils import RunIndex, get_top_k
+
+USER_QUERY = "Which satellites did the orbital debris removal mission capture in 2025?"
+SEARCH_QUERY = "orbital debris removal mission capture satellites"
+NEEDLE = ("The orbital debris removal mission captured two defunct satellites in 2025, "
+          "using a robotic arm to deorbit each captured satellite. ")
+
+
+class SimulatedEmbeddings(Embeddings):
+    def __init__(self, seconds_per_text: float):
+        self.seconds_per_text = seconds_per_text
+        self.texts = 0
+
+    def embed_documents(self, texts: list) -> list:
+        self.texts += len(texts)
+        time.sleep(self.seconds_per_text * len(texts))
+        return [hashed_embedding(text) for text in texts]
+
+    def embed_query(self, text: str) -> list:
+        return hashed_embedding(text)
+
+
+def fixture_pages(pages: int, needles: int, seed: int) -> tuple:
+    rng = seeded_random(seed, "needles")
+    needle_pages = set(rng.sample(range(pages), needles))
+    result = []
+    for i in range(pages):
+        content = fake_markdown(f"https://site{i}.example/article", paragraphs=120, seed=seed)
+        if i in needle_pages:
+            position = rng.randint(0, len(content))
+            content = content[:position] + f"\n\n{NEEDLE * 3}[needle {i}]\n\n" + content[position:]
+        result.append({"url": f"https://site{i}.example/article", "content": content})
+    return result, {f"[needle {i}]" for i in needle_pages}
+
+
+def run(pages: list, needles: set, fraction: float, args) -> dict:
+    embeddings = SimulatedEmbeddings(args.embed_ms / 1000)
+    index = RunIndex(embeddings=embeddings, prefilter="none" if fraction >= 1 else "bm25",
+                     prefilter_fraction=fraction, prefilter_min_chunks=args.min_chunks)
+    start = time.perf_counter()
+    index.add_pages(pages, queries=[USER_QUERY, SEARCH_QUERY])
+    indexed = time.perf_counter() - start
+    candidates = get_top_k(USER_QUERY, index, k=args.k)[:args.k]
+    found = {needle for needle in needles for document in candidates if needle in document.page_content}
+    return {
+        "fraction": fraction,
+        "embedded": embeddings.texts,
+        "index_s": indexed,
+        "total_s": time.perf_counter() - start,
+        "recall": len(found) / len(needles),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=30)
+    parser.add_argument("--needles", type=int, default=5)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--fractions", type=float, nargs="+", default=[1.0, 0.5, 0.3, 0.1])
+    parser.add_argument("--min-chunks", type=int, default=16)
+    parser.add_argument("--embed-ms", type=float, default=15.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    pages, needles = fixture_pages(args.pages, args.needles, args.seed)
+    for fraction in args.fractions:
+        result = run(pages, needles, fraction, args)
+        print(f"fraction={result['fraction']:4.2f}  embedded={result['embedded']:5d}  index={result['index_s']:6.2f}s  "
+              f"total={result['total_s']:6.2f}s  recall@{args.k}={result['recall']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
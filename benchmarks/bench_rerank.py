@@ -0,0 +1,84 @@
+"""Rerank latency: a fresh FlashrankRerank per call (the old get_top_k) vs the shared, warm, micro-batched Reranker.
+
+Needs FlashRank installed; the model is downloaded on first use. Reports the cold start (model load plus first call)
+and the steady-state per-branch latency with --branches concurrent branches per round.
+
+    python benchmarks/bench_rerank.py --branches 5 --candidates 15 --rounds 10 --threads 4
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from langchain_core.documents import Document
+from langchain_community.document_compressors import FlashrankRerank
+
+from stand_ins import fake_markdown
+from rerank import Reranker
+
+QUERY = "What are the latest results of active space debris removal missions?"
+
+
+def candidates(branch: int, count: int) -> list:
+    return [
+        Document(page_content=fake_markdown(f"https://site{branch}-{i}.example", paragraphs=6)[:2000],
+                 metadata={"chunk_hash": f"{branch}-{i}"})
+        for i in range(count)
+    ]
+
+
+def fresh_rerank(documents: list, k: int) -> list:
+    return list(FlashrankRerank(top_n=k).compress_documents(documents=documents, query=QUERY))
+
+
+def run_rounds(rerank, branches: list, rounds: int, k: int) -> list:
+    latencies = []
+
+    def timed(documents):
+        start = time.perf_counter()
+        rerank(documents, k)
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=len(branches)) as executor:
+        for _ in range(rounds):
+            latencies.extend(executor.map(timed, branches))
+    return latencies
+
+
+def report(name: str, cold: float, latencies: list):
+    latencies = sorted(latencies)
+    print(f"{name:<8} cold={cold * 1000:8.1f}ms  steady mean={statistics.mean(latencies) * 1000:7.1f}ms  "
+          f"p95={latencies[int(0.95 * (len(latencies) - 1))] * 1000:7.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--branches", type=int, default=5)
+    parser.add_argument("--candidates", type=int, default=15)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--threads", type=int, default=0, help="ONNX intra-op threads for the warm reranker, 0 = default")
+    parser.add_argument("--window", type=float, default=0.02)
+    parser.add_argument("--scope", choices=["branch", "run"], default="branch")
+    args = parser.parse_args()
+
+    branches = [candidates(branch, args.candidates) for branch in range(args.branches)]
+
+    start = time.perf_counter()
+    fresh_rerank(branches[0], args.k)
+    report("fresh", time.perf_counter() - start, run_rounds(fresh_rerank, branches, args.rounds, args.k))
+
+    reranker = Reranker(threads=args.threads, window=args.window, scope=args.scope)
+    start = time.perf_counter()
+    reranker.rerank(QUERY, branches[0], k=args.k)
+    warm_cold = time.perf_counter() - start
+    report("warm", warm_cold, run_rounds(lambda documents, k: reranker.rerank(QUERY, documents, k=k),
+                                         branches, args.rounds, args.k))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Per-branch scrape wall-clock time: sequential requests.get (baseline) vs the pooled ScrapePool.
+
+    python benchmarks/bench_scrape.py --branches 5 --urls 3 --slow-rate 0.1
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import requests
+
+from stand_ins import JinaStandIn
+from utils import SearchWrapper, DDGSearch, JinaReader
+
+
+def sequential_branch(reader_url: str, urls: list) -> float:
+    start = time.perf_counter()
+    for url in urls:
+        try:
+            requests.get(url=f"{reader_url}/{url}", headers={"X-Return-Format": "markdown"}).text
+        except requests.RequestException:
+            pass
+    return time.perf_counter() - start
+
+
+def pooled_branch(search_api: SearchWrapper, urls: list, branch_timeout: float) -> float:
+    start = time.perf_counter()
+    search_api.scrape_many(urls, timeout=branch_timeout)
+    return time.perf_counter() - start
+
+
+def report(name: str, timings: list):
+    print(f"{name:<12} mean={statistics.mean(timings):6.2f}s  max={max(timings):6.2f}s  "
+          f"per-branch={[round(t, 2) for t in timings]}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--branches", type=int, default=5)
+    parser.add_argument("--urls", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--slow-rate", type=float, default=0.1)
+    parser.add_argument("--slow-latency", type=float, default=15.0)
+    parser.add_argument("--request-timeout", type=float, default=5.0)
+    parser.add_argument("--branch-timeout", type=float, default=8.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    stand_in = JinaStandIn(latency=args.latency, slow_rate=args.slow_rate,
+                           slow_latency=args.slow_latency, seed=args.seed)
+    reader_url = stand_in.start()
+    branches = [[f"https://site{b}-{i}.example/article" for i in range(args.urls)] for b in range(args.branches)]
+
+    search_api = SearchWrapper(api="ddgs", cache=False)
+    search_api.api = DDGSearch(reader=JinaReader(reader_url=reader_url, timeout=args.request_timeout))
+
+    with ThreadPoolExecutor(max_workers=args.branches) as executor:
+        before = list(executor.map(lambda urls: sequential_branch(reader_url, urls), branches))
+        after = list(executor.map(lambda urls: pooled_branch(search_api, urls, args.branch_timeout), branches))
+
+    report("sequential", before)
+    report("pooled", after)
+    stand_in.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Search-stage tail latency: one provider vs hedged and merged fan-out over stub providers.
+
+Each provider answers after `--latency` seconds, with a `--slow-rate` share of calls taking `--slow-latency` and a
+`--failure-rate` share raising. Reports p50/p95/p99 fetch latency and the share of empty answers per mode.
+
+    python benchmarks/bench_search.py --providers 3 --queries 200 --slow-rate 0.05 --failure-rate 0.05
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from utils import SearchWrapper, StubSearch
+
+
+def stub_providers(args) -> list:
+    return [
+        StubSearch(name=f"stub{i}", latency=args.latency, slow_rate=args.slow_rate, slow_latency=args.slow_latency,
+                   failure_rate=args.failure_rate, seed=i)
+        for i in range(args.providers)
+    ]
+
+
+def run(search_api: SearchWrapper, queries: int, concurrency: int) -> tuple:
+    def timed(i):
+        start = time.perf_counter()
+        results = search_api.fetch(query=f"query {i}")
+        return time.perf_counter() - start, bool(results)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        outcomes = list(executor.map(timed, range(queries)))
+    return sorted(latency for latency, _ in outcomes), sum(not found for _, found in outcomes) / queries
+
+
+def report(name: str, latencies: list, empty: float):
+    def percentile(p):
+        return latencies[int(p * (len(latencies) - 1))] * 1000
+
+    print(f"{name:<8} p50={percentile(0.5):8.1f}ms  p95={percentile(0.95):8.1f}ms  p99={percentile(0.99):8.1f}ms  "
+          f"empty={empty:.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--providers", type=int, default=3)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--slow-rate", type=float, default=0.05)
+    parser.add_argument("--slow-latency", type=float, default=8.0)
+    parser.add_argument("--failure-rate", type=float, default=0.05)
+    parser.add_argument("--hedge-delay", type=float, default=1.5)
+    parser.add_argument("--timeout", type=float, default=10.0)
+    args = parser.parse_args()
+
+    modes = {
+        "single": dict(providers=stub_providers(args)[:1], mode="first"),
+        "hedged": dict(providers=stub_providers(args), mode="first"),
+        "merged": dict(providers=stub_providers(args), mode="merge")
+    }
+    for name, options in modes.items():
+        search_api = SearchWrapper(api=None, cache=False, hedge_delay=args.hedge_delay, timeout=args.timeout, **options)
+        report(name, *run(search_api, args.queries, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
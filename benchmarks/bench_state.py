@@ -0,0 +1,72 @@
+"""Per-step graph state size, checkpoint growth and peak RSS for end-to-end runs against the stand-in servers.
+
+    python benchmarks/bench_state.py --queries 4
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import sys
+import tempfile
+from uuid import uuid4
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from bench_graph import QUERIES, start_stand_ins, configure_environment
+
+
+def directory_bytes(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def run_query(stream, serde, user_query: str) -> dict:
+    sizes = []
+    blob_peak = 0
+    run_id = uuid4().hex
+    for state in stream(user_query, run_id, stream_mode="values"):
+        sizes.append(len(serde.dumps_typed(state)[1]))
+        blob_peak = max(blob_peak, directory_bytes(os.path.join(os.environ["BLOB_DIR"], run_id)))
+    return {"steps": len(sizes), "max_state_bytes": max(sizes), "mean_state_bytes": statistics.mean(sizes),
+            "final_state_bytes": sizes[-1], "blob_peak_bytes": blob_peak}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--search-latency", type=float, default=0.05)
+    parser.add_argument("--scrape-latency", type=float, default=0.05)
+    parser.add_argument("--slow-rate", type=float, default=0.0)
+    parser.add_argument("--search-failure-rate", type=float, default=0.0)
+    parser.add_argument("--scrape-failure-rate", type=float, default=0.0)
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    stand_ins = start_stand_ins(args)
+    cache_dir = tempfile.mkdtemp(prefix="deep-research-state-")
+    configure_environment(stand_ins, cache_dir)
+    os.environ["BLOB_DIR"] = os.path.join(cache_dir, "blobs")
+
+    import logging
+    from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+    from config import CHECKPOINT_PATH
+    from research import stream
+    logging.getLogger().setLevel(logging.WARNING)
+
+    serde = JsonPlusSerializer()
+    runs = [run_query(stream, serde, QUERIES[i % len(QUERIES)]) for i in range(args.queries)]
+    result = {
+        "runs": runs,
+        "max_state_bytes": max(run["max_state_bytes"] for run in runs),
+        "checkpoint_db_bytes": os.path.getsize(CHECKPOINT_PATH) if os.path.exists(CHECKPOINT_PATH) else 0,
+        # ru_maxrss is in kilobytes on Linux.
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+    print(json.dumps(result, indent=2))
+    for stand_in in stand_ins.values():
+        stand_in.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+"""Local stand-in servers used by the benchmarks. Everything here is stdlib-only and offline."""
+import json
+import math
+import random
+import re
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+WORD_PATTERN = re.compile(r"[a-zA-Z\u00C0-\u017F]{3,}")
+URL_PATTERN = re.compile(r"https?://[^\s\]\)>\"',]+")
+
+
+def seeded_random(seed: int, key: str) -> random.Random:
+    return random.Random(seed * 1_000_003 + zlib.crc32(key.encode()))
+
+
+def fake_markdown(url: str, paragraphs: int = 40, seed: int = 0) -> str:
+    rng = seeded_random(seed, url)
+    words = ["research", "agent", "model", "data", "report", "energy", "policy", "market", "launch",
+             "mission", "design", "director", "price", "growth", "study", "result", "source", "update"]
+    body = "\n\n".join(
+        " ".join(rng.choice(words) for _ in range(rng.randint(40, 120))) + f" ({2000 + rng.randint(0, 26)})."
+        for _ in range(paragraphs)
+    )
+    return f"Title: Page for {url}\n\nURL Source: {url}\n\nMarkdown Content:\n# {url}\n\n{body}\n"
+
+
+class StandInServer:
+    """Base class: serves `handle(handler)` on 127.0.0.1 with a configurable latency and failure rate."""
+
+    def __init__(self, latency: float = 0.2, jitter: float = 0.1, slow_rate: float = 0.0,
+                 slow_latency: float = 30.0, failure_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.failure_rate = failure_rate
+        self.seed = seed
+        self.requests = 0
+        self.server = None
+
+    def delay(self, key: str) -> float:
+        rng = seeded_random(self.seed, key)
+        if rng.random() < self.slow_rate:
+            return self.slow_latency
+        return max(0.0, self.latency + rng.uniform(-self.jitter, self.jitter))
+
+    def fails(self, key: str) -> bool:
+        return seeded_random(self.seed + 1, key).random() < self.failure_rate
+
+    def handle(self, handler: BaseHTTPRequestHandler):
+        raise NotImplementedError
+
+    def start(self) -> str:
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                stand_in.requests += 1
+                stand_in.handle(self)
+
+            def do_POST(self):
+                stand_in.requests += 1
+                stand_in.handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.url
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+
+def send(handler: BaseHTTPRequestHandler, status: int, body: bytes, content_type: str = "text/plain"):
+    handler.send_response(status)
+    handler.send_header("Content-Type", content_type)
+    handler.send_header("Content-Length", str(len(body)))
+    handler.end_headers()
+    handler.wfile.write(body)
+
+
+class JinaStandIn(StandInServer):
+    """Mimics r.jina.ai: GET /<target url> returns the page as Markdown."""
+
+    def handle(self, handler):
+        target = handler.path.lstrip("/")
+        time.sleep(self.delay(target))
+        if self.fails(target):
+            send(handler, 503, b"stand-in failure")
+            return
+        send(handler, 200, fake_markdown(target, seed=self.seed).encode(), "text/markdown; charset=utf-8")
+
+
+def fake_html(url: str, paragraphs: int = 400, seed: int = 0) -> str:
+    rng = seeded_random(seed, url)
+    menu = "".join(f'<li><a href="/section-{i}">Section {i}</a></li>' for i in range(40))
+    words = ["research", "model", "report", "energy", "policy", "market", "mission", "study", "result", "source"]
+    body = "\n".join(
+        (f"<h2>Part {i}</h2>" if i % 10 == 0 else "") + f"<p>{' '.join(rng.choice(words) for _ in range(80))}</p>"
+        for i in range(paragraphs)
+    )
+    return (
+        f"<!doctype html><html><head><title>Page for {url}</title>"
+        f"<script>{'var x = 1;' * 2000}</script><style>{'p {{ margin: 0 }}' * 500}</style></head>"
+        f'<body><nav class="navbar"><ul>{menu}</ul></nav><div class="cookie-banner">We use cookies.</div>'
+        f"<main><article><h1>{url}</h1>{body}</article></main>"
+        f'<aside class="sidebar"><ul>{menu}</ul></aside><footer>Copyright</footer></body></html>'
+    )
+
+
+class HtmlStandIn(StandInServer):
+    """Serves large HTML pages with navigation and script boilerplate at a limited bandwidth, plus binary files."""
+
+    def __init__(self, paragraphs: int = 400, bandwidth: float = 2_000_000, **kwargs):
+        super().__init__(**kwargs)
+        self.paragraphs = paragraphs
+        self.bandwidth = bandwidth
+        self.bytes_sent = 0
+
+    def handle(self, handler):
+        time.sleep(self.delay(handler.path))
+        if handler.path.endswith(".pdf"):
+            send(handler, 200, b"%PDF-1.7" + bytes(2_000_000), "application/pdf")
+            return
+        body = fake_html(handler.path, paragraphs=self.paragraphs, seed=self.seed).encode()
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/html; charset=utf-8")
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        chunk_size = 16_384
+        try:
+            for start in range(0, len(body), chunk_size):
+                handler.wfile.write(body[start:start + chunk_size])
+                self.bytes_sent += min(chunk_size, len(body) - start)
+                time.sleep(chunk_size / self.bandwidth)
+        except (BrokenPipeError, ConnectionResetError):
+            # The local reader hangs up once it has enough text.
+            pass
+
+
+class SearxStandIn(StandInServer):
+    """Mimics SearXNG's JSON API: GET /search?q=...&format=json returns canned results."""
+
+    def __init__(self, results: int = 5, domains: int = 12, **kwargs):
+        super().__init__(**kwargs)
+        self.results = results
+        self.domains = domains
+
+    def handle(self, handler):
+        query = parse_qs(urlsplit(handler.path).query).get("q", [""])[0]
+        time.sleep(self.delay(query))
+        if self.fails(query):
+            send(handler, 502, b"stand-in failure")
+            return
+        rng = seeded_random(self.seed, query)
+        results = [
+            {
+                "url": f"https://source{rng.randrange(self.domains)}.example/{'-'.join(query.lower().split()[:4])}/{i}",
+                "title": f"{query} ({i})",
+                "content": f"Snippet {i} about {query}."
+            }
+            for i in range(self.results)
+        ]
+        send(handler, 200, json.dumps({"query": query, "results": results}).encode(), "application/json")
+
+
+def hashed_embedding(text: str, dim: int = 256) -> list:
+    # Bag-of-words feature hashing: texts sharing words end up close, which is enough for retrieval to behave.
+    vector = [0.0] * dim
+    for word in WORD_PATTERN.findall(text.lower()):
+        bucket = zlib.crc32(word.encode())
+        vector[bucket % dim] += 1.0 if bucket & 1 else -1.0
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+
+
+class OllamaStandIn(StandInServer):
+    """Mimics the Ollama API used by langchain-ollama: /api/chat (schema-shaped JSON) and /api/embed.
+
+    Generation time is simulated from prompt and output sizes with per-model prefill/decode speeds, and
+    outputs are seeded by the request so identical requests produce identical responses."""
+
+    def __init__(self, prefill_tps: dict | None = None, decode_tps: dict | None = None, dim: int = 256,
+                 complete_rate: float = 0.7, **kwargs):
+        kwargs.setdefault("latency", 0.0)
+        kwargs.setdefault("jitter", 0.0)
+        super().__init__(**kwargs)
+        self.prefill_tps = {"qwen3:8b": 4000, "qwen3:14b": 2000, **(prefill_tps or {})}
+        self.decode_tps = {"qwen3:8b": 200, "qwen3:14b": 100, **(decode_tps or {})}
+        self.dim = dim
+        self.complete_rate = complete_rate
+
+    def handle(self, handler):
+        path = urlsplit(handler.path).path
+        body = json.loads(handler.rfile.read(int(handler.headers.get("Content-Length", 0))) or b"{}")
+        if path == "/api/chat":
+            self.chat(handler, body)
+        elif path in ("/api/embed", "/api/embeddings"):
+            self.embed(handler, body, legacy=path == "/api/embeddings")
+        elif path == "/api/tags":
+            send(handler, 200, json.dumps({"models": []}).encode(), "application/json")
+        else:
+            send(handler, 404, b"not found")
+
+    def embed(self, handler, body: dict, legacy: bool):
+        texts = body.get("input", body.get("prompt", ""))
+        texts = [texts] if isinstance(texts, str) else texts
+        time.sleep(self.latency + 0.001 * len(texts))
+        embeddings = [hashed_embedding(text, self.dim) for text in texts]
+        if legacy:
+            payload = {"embedding": embeddings[0]}
+        else:
+            payload = {"model": body.get("model"), "embeddings": embeddings, "prompt_eval_count": len(texts)}
+        send(handler, 200, json.dumps(payload).encode(), "application/json")
+
+    def chat(self, handler, body: dict):
+        model = body.get("model", "")
+        prompt = "\n".join(str(message.get("content", "")) for message in body.get("messages", []))
+        options = body.get("options") or {}
+        key = f"{model}|{options.get('seed')}|{options.get('temperature')}|{prompt}"
+        if self.fails(key):
+            send(handler, 500, json.dumps({"error": "stand-in failure"}).encode(), "application/json")
+            return
+        schema = body.get("format") if isinstance(body.get("format"), dict) else {"type": "object", "properties": {}}
+        rng = seeded_random(self.seed, key)
+        content = json.dumps(self.generate(schema, schema.get("$defs", {}), rng, prompt))
+
+        prompt_tokens = max(1, len(prompt) // 4)
+        eval_tokens = max(1, len(content) // 4)
+        prefill = prompt_tokens / self.prefill_tps.get(model, 4000)
+        decode = eval_tokens / self.decode_tps.get(model, 200)
+        time.sleep(self.latency + prefill)
+        final = {
+            "model": model,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "done": True,
+            "done_reason": "stop",
+            "total_duration": int((prefill + decode) * 1e9),
+            "load_duration": 0,
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int(prefill * 1e9),
+            "eval_count": eval_tokens,
+            "eval_duration": int(decode * 1e9)
+        }
+        if not body.get("stream", True):
+            time.sleep(decode)
+            final["message"] = {"role": "assistant", "content": content}
+            send(handler, 200, json.dumps(final).encode(), "application/json")
+            return
+
+        handler.send_response(200)
+        handler.send_header("Content-Type", "application/x-ndjson")
+        handler.send_header("Transfer-Encoding", "chunked")
+        handler.end_headers()
+        pieces = [content[i:i + 16] for i in range(0, len(content), 16)]
+        for piece in pieces:
+            time.sleep(decode / len(pieces))
+            write_chunk(handler, {"model": model, "created_at": final["created_at"],
+                                  "message": {"role": "assistant", "content": piece}, "done": False})
+        write_chunk(handler, {**final, "message": {"role": "assistant", "content": ""}})
+        handler.wfile.write(b"0\r\n\r\n")
+
+    def generate(self, schema: dict, defs: dict, rng: random.Random, prompt: str, name: str = ""):
+        if "$ref" in schema:
+            return self.generate(defs[schema["$ref"].split("/")[-1]], defs, rng, prompt, name)
+        if "anyOf" in schema:
+            return self.generate(next(s for s in schema["anyOf"] if s.get("type") != "null"), defs, rng, prompt, name)
+        kind = schema.get("type")
+        if kind == "object":
+            return {key: self.generate(value, defs, rng, prompt, key) for key, value in schema.get("properties", {}).items()}
+        if kind == "array":
+            return [self.generate(schema.get("items", {}), defs, rng, prompt, name) for _ in range(rng.randint(3, 5))]
+        if kind == "integer":
+            return rng.randint(schema.get("minimum", 1), schema.get("maximum", 10))
+        if kind == "number":
+            return rng.uniform(schema.get("minimum", 0), schema.get("maximum", 1))
+        if kind == "boolean":
+            return rng.random() < self.complete_rate
+        return self.text(name, rng, prompt)
+
+    @staticmethod
+    def text(name: str, rng: random.Random, prompt: str) -> str:
+        words = WORD_PATTERN.findall(prompt.split("[USER QUERY]:")[-1].split("\n")[0]) or ["topic"]
+        urls = sorted(set(URL_PATTERN.findall(prompt)))
+        if name == "query":
+            return " ".join(rng.sample(words, min(len(words), 4)) + [str(rng.randint(2020, 2026))])
+        if name == "summary":
+            return f"{' '.join(rng.choices(words, k=12))} reached {rng.randint(1, 999)} units in {rng.randint(2000, 2026)}."
+        if name == "report":
+            sections = []
+            for i in range(rng.randint(2, 4)):
+                cited = f" [{rng.choice(urls)}]" if urls else ""
+                sections.append(f"### Finding {i + 1}\n{' '.join(rng.choices(words, k=40))}.{cited}")
+            return "\n\n".join(sections) + "\n\n### Conclusion\n" + " ".join(rng.choices(words, k=20)) + "."
+        return " ".join(rng.choices(words, k=rng.randint(8, 20))) + "."
+
+
+def write_chunk(handler: BaseHTTPRequestHandler, payload: dict):
+    data = (json.dumps(payload) + "\n").encode()
+    handler.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+    handler.wfile.flush()
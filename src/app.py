@@ -1,7 +1,36 @@
+import time
 import streamlit as st
-from graph import graph
+from uuid import uuid4
+from research import shared_job_queue, unfinished_runs
+from config import METRICS_PORT, STREAM_DRAFTS, RUN_TIME_BUDGET
+from llm import partial_json_string
+from tracing import tracer, serve_prometheus
+
+@st.cache_resource
+def start_metrics_server():
+    return serve_prometheus(METRICS_PORT) if METRICS_PORT else None
+
+start_metrics_server()
 
 st.title("🕵️ Deep Research Agent")
+stream_drafts = st.sidebar.toggle("Stream drafts while writing", value=STREAM_DRAFTS)
+time_budget = st.sidebar.number_input(
+    "Time budget (s)", min_value=0, value=int(RUN_TIME_BUDGET), step=30,
+    help="The run returns its best report within this time, 0 for no limit"
+)
+
+resume_run = None
+active_runs = shared_job_queue().active_runs()
+interrupted_runs = [run for run in unfinished_runs() if run["run_id"] not in active_runs]
+if interrupted_runs:
+    st.sidebar.subheader("Interrupted runs")
+    for run in interrupted_runs:
+        if st.sidebar.button(
+            f"↻ {run['user_query'][:60]}",
+            key=run["run_id"],
+            help=f"Stopped before {', '.join(run['next'])} at {run['updated_at']}"
+        ):
+            resume_run = run
 
 if "messages" not in st.session_state:
     st.session_state.messages = []
@@ -10,32 +39,103 @@ for message in st.session_state.messages:
     with st.chat_message(message["role"]):
         st.markdown(message["content"])
 
-if user_input := st.chat_input("What do you want to research?"):
+user_input = st.chat_input("What do you want to research?")
+if resume_run:
+    user_input = resume_run["user_query"]
+    run_id = resume_run["run_id"]
+elif user_input:
+    run_id = uuid4().hex
+
+if user_input:
     st.session_state.messages.append({"role": "user", "content": user_input})
     with st.chat_message("user"):
         st.markdown(user_input)
 
     with st.chat_message("assistant"):
         status_container = st.status("Researching...", expanded=True)
+        report_placeholder = st.empty()
+        drafts_placeholder = st.empty()
+        drafts_container = drafts_placeholder.container()
+        if resume_run:
+            status_container.write(f"↻ Resuming from {', '.join(resume_run['next'])}...")
         try:
-            initial_state = {"user_query": user_input}
             final_report = ""
-            for event in graph.stream(initial_state):
-                for key, value in event.items():
-                    if key == "generate_queries":
-                        status_container.write("🤔 Generating search queries...")
-                    elif key == "search":
-                        status_container.write("🌐 Searching and scraping web pages...")
-                    elif key == "review":
-                        status_container.write("🧐 Reviewing findings...")
-                    elif key == "write":
-                        status_container.write("✍️ Drafting reports...")
-                    elif key == "evaluate":
-                        status_container.update(label="Research Complete", state="complete", expanded=False)
-                        final_report = value["final_report"]
-
-            st.markdown(final_report)
+            drafts = {}
+            best_grade = None
+            start = time.perf_counter()
+            first_output = None
+            stream_mode = ["updates", "messages", "custom"] if stream_drafts else ["updates"]
+            job_queue = shared_job_queue()
+            job = job_queue.submit(user_input, run_id=run_id, resume=resume_run is not None, stream_mode=stream_mode,
+                                   time_budget=time_budget)
+            while position := job_queue.position(job):
+                status_container.update(
+                    label=f"Queued behind {position - 1} other runs, done in about {job_queue.eta(job) / 60:.0f} min"
+                )
+                time.sleep(1)
+            status_container.update(label=f"Researching... about {job_queue.eta(job) / 60:.0f} min left")
+            for mode, payload in job.stream():
+                if mode == "messages":
+                    chunk, metadata = payload
+                    if metadata.get("langgraph_node") != "write":
+                        continue
+                    key = metadata.get("langgraph_checkpoint_ns")
+                    if key not in drafts:
+                        drafts[key] = {
+                            "id": None,
+                            "raw": "",
+                            "placeholder": drafts_container.expander(f"Draft {len(drafts) + 1}", expanded=True).empty()
+                        }
+                    draft = drafts[key]
+                    # A retry or the prefix-priming call is a new message, only the latest one is shown.
+                    if chunk.id != draft["id"]:
+                        draft["id"] = chunk.id
+                        draft["raw"] = ""
+                    draft["raw"] += chunk.content if isinstance(chunk.content, str) else ""
+                    text = partial_json_string(draft["raw"], "report")
+                    if text:
+                        first_output = first_output or time.perf_counter() - start
+                        draft["placeholder"].markdown(text)
+                elif mode == "custom":
+                    if payload.get("type") == "grade" and (best_grade is None or payload["grade"] > best_grade):
+                        best_grade = payload["grade"]
+                        report_placeholder.markdown(
+                            f"*Provisional best draft (grade {best_grade:.1f}), grading in progress...*\n\n{payload['report']}"
+                        )
+                else:
+                    for key, value in payload.items():
+                        if key == "recall":
+                            if value.get("recalled_from"):
+                                status_container.write("🧠 Answered from a previous run")
+                                final_report = value["final_report"]
+                            elif value.get("summaries"):
+                                status_container.write("🧠 Reusing findings from similar past research...")
+                        elif key == "generate_queries":
+                            status_container.write("🤔 Generating search queries...")
+                        elif key == "search":
+                            status_container.write("🌐 Searching and scraping web pages...")
+                        elif key == "review":
+                            status_container.write("🧐 Reviewing findings...")
+                        elif key == "write":
+                            status_container.write("✍️ Drafting reports...")
+                            if stream_drafts and best_grade is None and value["reports"]:
+                                first_output = first_output or time.perf_counter() - start
+                                report_placeholder.markdown(
+                                    f"*Provisional draft, grading pending...*\n\n{value['reports'][0]['report']}"
+                                )
+                        elif key == "evaluate":
+                            status_container.write("⚖️ Evaluating drafts...")
+                            final_report = value["final_report"]
+
+            status_container.update(label="Research Complete", state="complete", expanded=False)
+            drafts_placeholder.empty()
+            report_placeholder.markdown(final_report)
             st.session_state.messages.append({"role": "assistant", "content": final_report})
+            total = time.perf_counter() - start
+            if first_output is not None:
+                st.caption(f"First output after {first_output:.1f}s, final report after {total:.1f}s")
+            with st.expander("⏱️ Timing breakdown"):
+                st.dataframe(tracer.breakdown(run_id), hide_index=True)
 
         except Exception as e:
-            st.error(f"An error occurred: {e}")
\ No newline at end of file
+            st.error(f"An error occurred: {e}. The run can be resumed from the sidebar.")
@@ -0,0 +1,102 @@
+import argparse
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from uuid import NAMESPACE_URL, uuid5
+
+from config import MAX_ACTIVE_RUNS
+from llm import llm_call_stats
+from research import run_or_resume
+from tracing import tracer
+
+logger = logging.getLogger("batch")
+
+def read_queries(path: str) -> list:
+    queries = []
+    with open(path) as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if isinstance(item, str):
+                item = {"query": item}
+            query = item.get("query") or item.get("user_query")
+            if not query:
+                raise ValueError(f"{path}:{line_number}: no 'query' field")
+            queries.append({"id": str(item.get("id", line_number)), "query": query})
+    return queries
+
+def read_done(path: str) -> set:
+    if not os.path.exists(path):
+        return set()
+    with open(path) as f:
+        return {record["id"] for record in map(json.loads, filter(str.strip, f)) if record["status"] == "ok"}
+
+def batch_run_id(input_path: str, query_id: str) -> str:
+    # Stable per input file and query, so a rerun of an interrupted batch finds each query's checkpoint again.
+    return uuid5(NAMESPACE_URL, f"{os.path.abspath(input_path)}#{query_id}").hex
+
+def run_one(item: dict, run_id: str) -> dict:
+    start = time.perf_counter()
+    record = {"id": item["id"], "query": item["query"], "run_id": run_id}
+    try:
+        final_state = run_or_resume(item["query"], run_id=run_id)
+        record.update({
+            "status": "ok",
+            "final_report": final_state["final_report"],
+            "grade": max((grade["grade"] for grade in final_state.get("grades", [])), default=None),
+            "drafts": len(final_state.get("reports", [])),
+            "recalled_from": final_state.get("recalled_from") or None
+        })
+    except Exception as e:
+        logger.warning(f"Query {item['id']} failed: {e}")
+        record.update({"status": "failed", "error": repr(e)})
+    record["latency_s"] = round(time.perf_counter() - start, 3)
+    record["node_s"] = {
+        row["name"].removeprefix("node."): round(row["total_s"], 3)
+        for row in tracer.breakdown(run_id) if row["name"].startswith("node.")
+    }
+    return record
+
+def run_batch(input_path: str, output_path: str, parallelism: int = MAX_ACTIVE_RUNS) -> dict:
+    queries = read_queries(input_path)
+    done = read_done(output_path)
+    pending = [item for item in queries if item["id"] not in done]
+    logger.info(f"{len(queries)} queries, {len(done)} already done, {len(pending)} to run")
+    counts = {"ok": 0, "failed": 0}
+    start = time.perf_counter()
+    # Scrape, embedding and LLM caches are process-wide, so every query in the batch shares them.
+    with open(output_path, "a") as output, ThreadPoolExecutor(max_workers=parallelism) as executor:
+        futures = [executor.submit(run_one, item, batch_run_id(input_path, item["id"])) for item in pending]
+        for future in as_completed(futures):
+            record = future.result()
+            output.write(json.dumps(record) + "\n")
+            output.flush()
+            counts[record["status"]] += 1
+            finished = counts["ok"] + counts["failed"]
+            elapsed = time.perf_counter() - start
+            logger.info(f"[{finished}/{len(pending)}] {record['id']} {record['status']} in {record['latency_s']:.1f}s, "
+                        f"{finished / elapsed * 3600:.0f} queries/hour")
+    elapsed = time.perf_counter() - start
+    return {
+        "queries": len(queries),
+        "skipped": len(done),
+        **counts,
+        "wall_s": round(elapsed, 3),
+        "queries_per_hour": round(len(pending) / elapsed * 3600, 1) if pending else 0.0,
+        # Calls, retries, JSON repairs and fallbacks per node, summed over the whole batch.
+        "llm": llm_call_stats()
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a JSONL file of research queries, resuming where a previous run stopped.")
+    parser.add_argument("input", help="JSONL file, one {\"id\": ..., \"query\": ...} object per line")
+    parser.add_argument("output", help="JSONL results file, appended to and used to skip queries already done")
+    parser.add_argument("--parallelism", type=int, default=MAX_ACTIVE_RUNS, help="Queries run at once")
+    args = parser.parse_args()
+    # Keeps the nodes' verbose logging quiet while still reporting progress.
+    logging.getLogger().setLevel(logging.WARNING)
+    logger.setLevel(logging.INFO)
+    print(json.dumps(run_batch(args.input, args.output, parallelism=args.parallelism), indent=2))
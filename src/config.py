@@ -0,0 +1,152 @@
+import os
+
+JINA_READER_URL = os.getenv("JINA_READER_URL", "https://r.jina.ai")
+JINA_API_KEY = os.getenv("JINA_API_KEY")
+
+# Scraping
+SCRAPE_TIMEOUT = float(os.getenv("SCRAPE_TIMEOUT", 20))
+BRANCH_SCRAPE_TIMEOUT = float(os.getenv("BRANCH_SCRAPE_TIMEOUT", 45))
+SCRAPE_WORKERS = int(os.getenv("SCRAPE_WORKERS", 16))
+SCRAPE_PER_HOST = int(os.getenv("SCRAPE_PER_HOST", 4))
+
+# Scraper backend: "jina" goes through the r.jina.ai reader, "local" streams and extracts pages in-process
+SCRAPER = os.getenv("SCRAPER", "jina")
+SCRAPE_MAX_BYTES = int(os.getenv("SCRAPE_MAX_BYTES", 5 * 1024 * 1024))
+
+# Caches
+CACHE_DIR = os.getenv("DEEP_RESEARCH_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "deep-research"))
+SCRAPE_CACHE_ENABLED = os.getenv("SCRAPE_CACHE", "1") != "0"
+SCRAPE_CACHE_TTL = float(os.getenv("SCRAPE_CACHE_TTL", 24 * 3600))
+SCRAPE_CACHE_STALE_TTL = float(os.getenv("SCRAPE_CACHE_STALE_TTL", 7 * 24 * 3600))
+SCRAPE_CACHE_MAX_BYTES = int(os.getenv("SCRAPE_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+# Run-scoped page bodies, referenced from the graph state by content hash
+BLOB_DIR = os.getenv("BLOB_DIR", os.path.join(CACHE_DIR, "blobs"))
+# Page bodies of runs that were interrupted and never resumed are deleted after this many seconds
+BLOB_MAX_AGE = float(os.getenv("BLOB_MAX_AGE", 7 * 24 * 3600))
+
+# Embeddings
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "nomic-embed-text")
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 64))
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE", "1") != "0"
+
+# Near-duplicate pages and chunks are dropped before embedding when their SimHashes differ by at most this many bits
+NEAR_DUPLICATES_ENABLED = os.getenv("NEAR_DUPLICATES", "1") != "0"
+NEAR_DUPLICATE_BITS = int(os.getenv("NEAR_DUPLICATE_BITS", 3))
+
+# Lexical prefilter: "bm25" embeds only the chunks that score best against the queries, "none" embeds every chunk
+PREFILTER = os.getenv("PREFILTER", "bm25")
+PREFILTER_FRACTION = float(os.getenv("PREFILTER_FRACTION", 0.3))
+PREFILTER_MIN_CHUNKS = int(os.getenv("PREFILTER_MIN_CHUNKS", 16))
+RRF_K = int(os.getenv("RRF_K", 60))
+
+# Run-scoped vector index
+HNSW_THRESHOLD = int(os.getenv("HNSW_THRESHOLD", 10_000))
+HNSW_M = int(os.getenv("HNSW_M", 32))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", 128))
+
+# LLM concurrency, matches Ollama's OLLAMA_NUM_PARALLEL server setting
+OLLAMA_NUM_PARALLEL = int(os.getenv("OLLAMA_NUM_PARALLEL", 4))
+
+# Scheduler: in-flight calls per model across all runs, as "model=limit" pairs, other models use OLLAMA_NUM_PARALLEL
+MODEL_CONCURRENCY = {
+    model: int(limit) for model, limit in (
+        item.rsplit("=", 1) for item in os.getenv(
+            "MODEL_CONCURRENCY", f"qwen3:8b={OLLAMA_NUM_PARALLEL},qwen3:14b=2,{EMBEDDING_MODEL}=2"
+        ).split(",") if item
+    )
+}
+# Models Ollama can keep loaded side by side (its OLLAMA_MAX_LOADED_MODELS), beyond that calls are grouped by model
+OLLAMA_MAX_LOADED_MODELS = int(os.getenv("OLLAMA_MAX_LOADED_MODELS", 2))
+MODEL_SWITCH_AFTER = float(os.getenv("MODEL_SWITCH_AFTER", 30))
+MAX_ACTIVE_RUNS = int(os.getenv("MAX_ACTIVE_RUNS", 2))
+RUN_ETA_DEFAULT = float(os.getenv("RUN_ETA_DEFAULT", 300))
+
+# Evaluator: "parallel" grades every draft at once, "tournament" grades in waves and stops early
+EVALUATOR_MODE = os.getenv("EVALUATOR_MODE", "parallel")
+EVALUATOR_WAVE_SIZE = int(os.getenv("EVALUATOR_WAVE_SIZE", 2))
+
+# Anytime mode: a per-run time budget in seconds (0 = unbounded), of which WRITE_RESERVE is kept for writing and grading
+RUN_TIME_BUDGET = float(os.getenv("RUN_TIME_BUDGET", 0))
+WRITE_RESERVE = float(os.getenv("WRITE_RESERVE", 0.4))
+# Under a deadline each LLM call stops streaming when the budget runs out, but gets at least LLM_MIN_CALL_TIMEOUT
+# seconds, gives up when Ollama sends nothing for LLM_STALL_TIMEOUT seconds, and its num_predict is cut to what the
+# model generates in the time left, starting from LLM_EVAL_RATE tokens/s
+LLM_MIN_CALL_TIMEOUT = float(os.getenv("LLM_MIN_CALL_TIMEOUT", 30))
+LLM_STALL_TIMEOUT = float(os.getenv("LLM_STALL_TIMEOUT", 120))
+LLM_EVAL_RATE = float(os.getenv("LLM_EVAL_RATE", 20))
+
+# Adaptive best-of-N writing
+INITIAL_DRAFTS = int(os.getenv("INITIAL_DRAFTS", 2))
+DRAFT_WAVE_SIZE = int(os.getenv("DRAFT_WAVE_SIZE", 2))
+MAX_DRAFTS = int(os.getenv("MAX_DRAFTS", 5))
+DRAFT_GRADE_THRESHOLD = float(os.getenv("DRAFT_GRADE_THRESHOLD", 8.0))
+WRITER_TEMPERATURE = float(os.getenv("WRITER_TEMPERATURE", 0.6))
+WRITER_TEMPERATURE_STEP = float(os.getenv("WRITER_TEMPERATURE_STEP", 0.15))
+WRITER_SEED = int(os.getenv("WRITER_SEED", 0))
+
+# LLM response cache
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE", "1") != "0"
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 50_000))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", 7 * 24 * 3600))
+LLM_CACHE_DISABLED_NODES = {node for node in os.getenv("LLM_CACHE_DISABLED_NODES", "").split(",") if node}
+LLM_MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", 3))
+LLM_RETRY_BACKOFF = float(os.getenv("LLM_RETRY_BACKOFF", 0.5))
+
+# Checkpoints, one thread per run_id so interrupted runs can be resumed
+CHECKPOINTS_ENABLED = os.getenv("CHECKPOINTS", "1") != "0"
+CHECKPOINT_PATH = os.getenv("CHECKPOINT_PATH", os.path.join(CACHE_DIR, "checkpoints.sqlite"))
+
+# Research memory: finished runs answer near-identical queries again and seed similar ones with their summaries
+MEMORY_ENABLED = os.getenv("MEMORY", "1") != "0"
+MEMORY_PATH = os.getenv("MEMORY_PATH", os.path.join(CACHE_DIR, "memory.sqlite"))
+MEMORY_MAX_RUNS = int(os.getenv("MEMORY_MAX_RUNS", 5000))
+# A past report is returned as is above this query similarity, if it was graded at least MEMORY_MIN_GRADE
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", 0.95))
+ANSWER_CACHE_MAX_AGE = float(os.getenv("ANSWER_CACHE_MAX_AGE", 24 * 3600))
+MEMORY_MIN_GRADE = float(os.getenv("MEMORY_MIN_GRADE", DRAFT_GRADE_THRESHOLD))
+# Above this similarity a past run's summaries seed the new run, if they are younger than MEMORY_MAX_AGE
+MEMORY_SEED_THRESHOLD = float(os.getenv("MEMORY_SEED_THRESHOLD", 0.8))
+MEMORY_MAX_AGE = float(os.getenv("MEMORY_MAX_AGE", 7 * 24 * 3600))
+MEMORY_SEED_LIMIT = int(os.getenv("MEMORY_SEED_LIMIT", 12))
+
+# Tracing: spans are kept in memory for the last TRACE_MAX_RUNS runs, and also appended to TRACE_PATH if it is set
+TRACE_PATH = os.getenv("TRACE_PATH", "")
+TRACE_MAX_RUNS = int(os.getenv("TRACE_MAX_RUNS", 100))
+METRICS_PORT = int(os.getenv("METRICS_PORT", 0))
+
+# Search provider and reranker
+SEARCH_API = os.getenv("SEARCH_API", "ddgs")
+SEARXNG_URL = os.getenv("SEARXNG_URL", "http://localhost:8888")
+SEARCH_TIMEOUT = float(os.getenv("SEARCH_TIMEOUT", 10))
+# Search providers queried for each search, SEARCH_API first, e.g. "ddgs,searxng"
+SEARCH_PROVIDERS = [name.strip() for name in os.getenv("SEARCH_PROVIDERS", SEARCH_API).split(",") if name.strip()]
+# "first" takes the first non-empty answer, starting the next provider if one is slower than SEARCH_HEDGE_DELAY;
+# "merge" queries all of them and merges what has arrived by SEARCH_TIMEOUT
+SEARCH_MODE = os.getenv("SEARCH_MODE", "first")
+SEARCH_HEDGE_DELAY = float(os.getenv("SEARCH_HEDGE_DELAY", 1.5))
+# A provider failing SEARCH_BREAKER_FAILURES times in a row is skipped for SEARCH_BREAKER_COOLDOWN seconds
+SEARCH_BREAKER_FAILURES = int(os.getenv("SEARCH_BREAKER_FAILURES", 3))
+SEARCH_BREAKER_COOLDOWN = float(os.getenv("SEARCH_BREAKER_COOLDOWN", 60))
+RERANKER = os.getenv("RERANKER", "flashrank")
+RERANK_MODEL = os.getenv("RERANK_MODEL", "ms-marco-TinyBERT-L-2-v2")
+RERANK_THREADS = int(os.getenv("RERANK_THREADS", 0))
+RERANK_BATCH_WINDOW = float(os.getenv("RERANK_BATCH_WINDOW", 0.02))
+RERANK_MAX_BATCH = int(os.getenv("RERANK_MAX_BATCH", 16))
+# "branch" ranks each branch's own candidates, "run" ranks concurrent branches' candidates as one pool and deals out the best
+RERANK_SCOPE = os.getenv("RERANK_SCOPE", "branch")
+
+# Prompt context
+NUM_CTX = int(os.getenv("NUM_CTX", 16384))
+CONTEXT_BUDGET = int(os.getenv("CONTEXT_BUDGET", 8192))
+CHARS_PER_TOKEN = float(os.getenv("CHARS_PER_TOKEN", 3.5))
+WRITER_NUM_PREDICT = int(os.getenv("WRITER_NUM_PREDICT", 4096))
+EVALUATOR_NUM_PREDICT = int(os.getenv("EVALUATOR_NUM_PREDICT", 1024))
+REVIEWER_NUM_PREDICT = int(os.getenv("REVIEWER_NUM_PREDICT", 1024))
+
+# Prompt layout: "stable" puts the shared prefix first so Ollama can reuse its KV cache across fan-out calls
+PROMPT_LAYOUT = os.getenv("PROMPT_LAYOUT", "stable")
+PREFIX_PRIMING = os.getenv("PREFIX_PRIMING", "1") != "0"
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+
+# Streamlit app
+STREAM_DRAFTS = os.getenv("STREAM_DRAFTS", "1") != "0"
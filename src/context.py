@@ -0,0 +1,81 @@
+import math
+import re
+from collections import Counter
+from datetime import datetime
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from config import CHARS_PER_TOKEN, CONTEXT_BUDGET, PROMPT_LAYOUT
+from utils import normalize_url
+
+WORD_PATTERN = re.compile(r"\w{3,}")
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+|\n+")
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+def context_budget(num_ctx: int, reserve: int, *fixed_texts: str, budget: int = CONTEXT_BUDGET) -> int:
+    # Whatever the window leaves after the fixed messages and the space reserved for the answer.
+    available = num_ctx - reserve - sum(estimate_tokens(text) for text in fixed_texts)
+    return max(0, min(budget, available))
+
+def merge_summaries(summaries: list) -> list:
+    sources = {}
+    seen_facts = set()
+    for summary in summaries:
+        text = (summary.get("summary") or "").strip()
+        if not text:
+            continue
+        source = sources.setdefault(normalize_url(summary["url"]), {"url": summary["url"], "facts": []})
+        for fact in SENTENCE_PATTERN.split(text):
+            fact = fact.strip(" -•*")
+            key = " ".join(WORD_PATTERN.findall(fact.lower()))
+            # The same fact often comes back from overlapping pages or from several chunks of one page.
+            if key and key not in seen_facts:
+                seen_facts.add(key)
+                source["facts"].append(fact)
+    return [source for source in sources.values() if source["facts"]]
+
+def relevance(source: dict, query_terms: Counter) -> float:
+    terms = Counter(WORD_PATTERN.findall(" ".join(source["facts"]).lower()))
+    length = sum(terms.values()) or 1
+    return sum(1 + math.log(terms[term]) for term in query_terms if terms[term]) / math.sqrt(length)
+
+def render_source(index: int, source: dict) -> str:
+    return f"[{index}] {source['url']}\n" + "\n".join(f"- {fact}" for fact in source["facts"])
+
+def build_context(summaries: list, user_query: str, budget: int = CONTEXT_BUDGET) -> str:
+    sources = merge_summaries(summaries)
+    query_terms = Counter(WORD_PATTERN.findall(user_query.lower()))
+    ranked = sorted(sources, key=lambda source: relevance(source, query_terms), reverse=True)
+
+    blocks = []
+    used = 0
+    for source in ranked:
+        block = render_source(len(blocks) + 1, source)
+        cost = estimate_tokens(block) + 1
+        if used + cost > budget:
+            # Keep as many facts of this source as still fit, most of the time the first ones carry the answer.
+            facts = list(source["facts"])
+            while facts and used + cost > budget:
+                facts.pop()
+                block = render_source(len(blocks) + 1, {**source, "facts": facts})
+                cost = estimate_tokens(block) + 1
+            if not facts:
+                continue
+        blocks.append(block)
+        used += cost
+    return "\n\n".join(blocks) if blocks else "(no relevant information was found)"
+
+def current_date():
+    # Day resolution keeps prompts, and therefore LLM cache keys, stable within a day.
+    return datetime.now().strftime("%Y-%m-%d")
+
+def assemble_prompt(system_prompt: str, shared: list, variable: list, layout: str = PROMPT_LAYOUT) -> list:
+    date = f"[CURRENT DATE AND TIME]: {current_date()}"
+    if layout == "legacy":
+        return [SystemMessage(system_prompt), SystemMessage(date), *(SystemMessage(part) for part in shared + variable)]
+    # Everything shared by a fan-out goes into one byte-identical leading message; per-call content goes last.
+    return [
+        SystemMessage("\n\n".join([system_prompt.strip(), *shared])),
+        HumanMessage("\n\n".join([*variable, date]))
+    ]
@@ -0,0 +1,49 @@
+import re
+from hashlib import blake2b
+import numpy as np
+
+from config import NEAR_DUPLICATE_BITS
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+def simhash(text: str, shingle: int = 3) -> int:
+    # 64-bit SimHash over word shingles: near-identical texts (mirrors, syndicated copies, boilerplate changes)
+    # end up a few bits apart, unrelated texts about 32 bits apart.
+    tokens = TOKEN_PATTERN.findall(text.lower())
+    shingles = {" ".join(tokens[i:i + shingle]) for i in range(max(1, len(tokens) - shingle + 1))}
+    hashes = np.array(
+        [int.from_bytes(blake2b(item.encode("utf-8"), digest_size=8).digest(), "little") for item in shingles],
+        dtype=np.uint64
+    )
+    bits = np.unpackbits(hashes.view(np.uint8)).reshape(-1, 64)
+    return int.from_bytes(np.packbits(bits.sum(axis=0) * 2 > len(hashes)).tobytes(), "big")
+
+class SimHashIndex:
+    # Splits fingerprints into max_distance + 1 bands: two fingerprints within max_distance bits of each other
+    # share at least one band exactly, so a lookup only compares against the fingerprints in matching buckets.
+    def __init__(self, max_distance: int = NEAR_DUPLICATE_BITS):
+        self.max_distance = max_distance
+        width = 64 // (max_distance + 1)
+        self.bands = [(start, 64 - start if band == max_distance else width)
+                      for band, start in enumerate(range(0, width * (max_distance + 1), width))]
+        self.buckets = [{} for _ in self.bands]
+
+    def keys(self, fingerprint: int) -> list:
+        return [(fingerprint >> start) & ((1 << width) - 1) for start, width in self.bands]
+
+    def find(self, fingerprint: int) -> int | None:
+        for buckets, key in zip(self.buckets, self.keys(fingerprint)):
+            for other in buckets.get(key, ()):
+                if (fingerprint ^ other).bit_count() <= self.max_distance:
+                    return other
+        return None
+
+    def add(self, fingerprint: int):
+        for buckets, key in zip(self.buckets, self.keys(fingerprint)):
+            buckets.setdefault(key, []).append(fingerprint)
+
+    def add_if_new(self, fingerprint: int) -> bool:
+        if self.find(fingerprint) is not None:
+            return False
+        self.add(fingerprint)
+        return True
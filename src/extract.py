@@ -0,0 +1,102 @@
+import re
+from html.parser import HTMLParser
+
+BLOCK_TAGS = {
+    "p", "div", "section", "article", "main", "li", "ul", "ol", "h1", "h2", "h3", "h4", "h5", "h6", "tr", "table",
+    "blockquote", "pre", "dl", "dt", "dd", "figcaption", "br", "hr"
+}
+SKIPPED_TAGS = {
+    "script", "style", "noscript", "template", "svg", "canvas", "iframe", "nav", "footer", "aside", "form",
+    "button", "select", "dialog"
+}
+# Content containers are never skipped on their class, id or role: themes put layout classes such as
+# "content-sidebar" or "has-comments" on <body> and <article>, and skipping them would drop the whole page.
+LANDMARK_TAGS = {"html", "body", "main", "article"}
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+BOILERPLATE_PATTERN = re.compile(
+    r"\b(nav|navbar|menu|sidebar|footer|cookies?|consent|banner|advert\w*|sponsor\w*|promo|share|social|"
+    r"newsletter|subscribe|comments?|breadcrumbs?|related|popup|modal)\b",
+    re.IGNORECASE
+)
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+class MarkdownExtractor(HTMLParser):
+    # Turns HTML into Markdown as it is fed, dropping navigation, scripts and other boilerplate, so the caller
+    # can stop reading the page as soon as `size` reaches the text it needs.
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.blocks = []
+        self.size = 0
+        self.line = []
+        self.prefix = ""
+        self.skipped = []
+        self.pre = 0
+        self.title = None
+
+    def handle_starttag(self, tag, attrs):
+        if self.skipped:
+            if tag not in VOID_TAGS:
+                self.skipped.append(tag)
+            return
+        attributes = dict(attrs)
+        markers = "" if tag in LANDMARK_TAGS else " ".join(attributes.get(name) or "" for name in ("class", "id", "role"))
+        if tag in SKIPPED_TAGS or (markers.strip() and BOILERPLATE_PATTERN.search(markers)):
+            if tag not in VOID_TAGS:
+                self.skipped.append(tag)
+            return
+        if tag == "title":
+            self.title = ""
+        if tag in BLOCK_TAGS:
+            self.flush()
+        if tag in ("h1", "h2", "h3", "h4", "h5", "h6"):
+            self.prefix = "#" * int(tag[1]) + " "
+        elif tag == "li":
+            self.prefix = "- "
+        elif tag == "blockquote":
+            self.prefix = "> "
+        elif tag == "pre":
+            self.pre += 1
+            self.prefix = "```\n"
+
+    def handle_endtag(self, tag):
+        if self.skipped:
+            # Closes everything opened inside the matching element, so unclosed <li> or <p> cannot leak.
+            if tag in self.skipped:
+                del self.skipped[len(self.skipped) - 1 - self.skipped[::-1].index(tag):]
+            return
+        if tag == "title" and self.title is not None:
+            title = WHITESPACE_PATTERN.sub(" ", self.title).strip()
+            self.title = None
+            if title:
+                self.append(f"Title: {title}")
+        elif tag == "pre" and self.pre:
+            self.line.append("\n```")
+            self.flush()
+            self.pre -= 1
+        elif tag in BLOCK_TAGS:
+            self.flush()
+
+    def handle_data(self, data):
+        if self.skipped:
+            return
+        if self.title is not None:
+            self.title += data
+        elif self.pre:
+            self.line.append(data)
+        else:
+            self.line.append(WHITESPACE_PATTERN.sub(" ", data))
+
+    def flush(self):
+        text = "".join(self.line) if self.pre else "".join(self.line).strip()
+        self.line = []
+        if text.strip():
+            self.append(self.prefix + text)
+        self.prefix = ""
+
+    def append(self, block: str):
+        self.blocks.append(block)
+        self.size += len(block) + 2
+
+    def markdown(self) -> str:
+        self.flush()
+        return "\n\n".join(self.blocks)
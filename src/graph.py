@@ -1,102 +1,216 @@
 from langgraph.graph import StateGraph, END
-from langchain_core.messages import SystemMessage
-from langchain_ollama import ChatOllama
+from langchain_core.runnables import RunnableLambda
+from langgraph.checkpoint.sqlite import SqliteSaver
 import logging
+import math
+import os
+import re
+import sqlite3
+import time
 from langgraph.types import Send
-from datetime import datetime
+from langgraph.config import get_stream_writer
+from uuid import uuid4
 
 from prompts import *
 from states import *
-from utils import SearchWrapper, create_vector_store, get_top_k, save_report
+from config import (
+    OLLAMA_NUM_PARALLEL, EVALUATOR_MODE, EVALUATOR_WAVE_SIZE, INITIAL_DRAFTS, DRAFT_WAVE_SIZE, MAX_DRAFTS,
+    DRAFT_GRADE_THRESHOLD, WRITER_TEMPERATURE, WRITER_TEMPERATURE_STEP, WRITER_SEED, SEARCH_API,
+    RERANKER, NUM_CTX, WRITER_NUM_PREDICT, EVALUATOR_NUM_PREDICT, REVIEWER_NUM_PREDICT, OLLAMA_KEEP_ALIVE,
+    CHECKPOINTS_ENABLED, CHECKPOINT_PATH, WRITE_RESERVE, BRANCH_SCRAPE_TIMEOUT, MEMORY_ENABLED
+)
+from context import build_context, context_budget, assemble_prompt
+from rerank import shared_reranker
+from llm import CachedChatOllama, StructuredLLM, PrefixPrimer, llm_cache
+from memory import ResearchMemory, shared_memory
+from tracing import traced_node
+from utils import (
+    SearchWrapper, get_run_index, release_run_index, get_blob_store, release_blob_store, get_top_k, save_report,
+    normalize_url
+)
 
 logging.basicConfig(level=logging.INFO)
 
-current_date = datetime.now()
+WRITE_ERROR = "An error occurred during the writing."
+
+def emit(event: dict):
+    try:
+        get_stream_writer()(event)
+    except RuntimeError:
+        # Called outside of a graph run, there is nobody to stream to.
+        pass
+
+# Balanced parentheses are part of the URL (Wikipedia's "Mercury_(planet)"), an unmatched one closes a Markdown link.
+CITATION_PATTERN = re.compile(r"https?://(?:[^\s\[\]()<>\"',]|\([^\s()<>\"']*\))+")
+
+def budget_left(state) -> float:
+    # Share of the run's time budget still left: 1.0 for a run without a deadline, 0.0 once it has passed.
+    if not state.get("deadline"):
+        return 1.0
+    return min(1.0, max(0.0, (state["deadline"] - time.time()) / state["time_budget"]))
+
+def search_budget_left(state) -> float:
+    # Searching may only spend the budget above WRITE_RESERVE, the rest is kept for writing and grading.
+    if not state.get("deadline") or WRITE_RESERVE <= 0:
+        return budget_left(state)
+    if WRITE_RESERVE >= 1:
+        return 0.0
+    return max(0.0, (budget_left(state) - WRITE_RESERVE) / (1 - WRITE_RESERVE))
+
+def write_budget_left(state) -> float:
+    # Share of the WRITE_RESERVE still left, 1.0 until searching has eaten into it.
+    if not state.get("deadline") or WRITE_RESERVE <= 0:
+        return 1.0
+    return min(1.0, budget_left(state) / WRITE_RESERVE)
+
+def scaled(count: int, fraction: float) -> int:
+    return max(1, min(count, math.ceil(count * fraction)))
+
+class Recaller:
+    def __init__(self, memory: ResearchMemory | None = None):
+        self.memory = memory
+
+    def recall(self, state: RecallState):
+        logging.info("Entered in the 'recall' node")
+        run_id = state.get("run_id") or uuid4().hex
+        if self.memory is None:
+            return {"run_id": run_id, "recalled_from": ""}
+        try:
+            matches = self.memory.search(state["user_query"])
+        except Exception as e:
+            logging.warning(f"Research memory lookup failed: {e}")
+            return {"run_id": run_id, "recalled_from": ""}
+        answer = self.memory.answer(matches)
+        if answer is not None:
+            logging.info(f"Answering from run {answer['run_id']} ({answer['similarity']:.3f}): {answer['user_query']}")
+            return {"run_id": run_id, "recalled_from": answer["run_id"], "final_report": answer["final_report"]}
+        summaries = self.memory.seed(matches)
+        if not summaries:
+            return {"run_id": run_id, "recalled_from": ""}
+        # The reviewer sees the seeded summaries first and only sends the run searching if they fall short.
+        logging.info(f"Seeded {len(summaries)} summaries from {len(matches)} similar runs")
+        return {"run_id": run_id, "recalled_from": "", "summaries": summaries, "search_iteration": 0}
 
 class QueryGenerator:
     def __init__(self, model: str = "qwen3:8b"):
-        self.llm = ChatOllama(
+        self.llm = CachedChatOllama(
             model=model,
-            num_predict=4096,
-            format="json"
+            cache=llm_cache("generate_queries"),
+            num_ctx=NUM_CTX,
+            keep_alive=OLLAMA_KEEP_ALIVE,
+            num_predict=4096
         )
-        self.structured_llm = self.llm.with_structured_output(GenerateQueries)
+        self.structured_llm = StructuredLLM(self.llm, GenerateQueries, node="generate_queries")
         self.system_prompt = GENERATE_QUERIES_PROMPT
 
     def generate_queries(self, state: QueryGeneratorState):
         logging.info("Entered in the 'generate_queries' node")
         search_iteration = state.get("search_iteration", 0) + 1
-        prompt = [
-            SystemMessage(self.system_prompt),
-            SystemMessage(f"[USER QUERY]: {state["user_query"]}"),
-            SystemMessage(f"[CURRENT DATE AND TIME]: {current_date}")
-        ]
-        response = GenerateQueries(
+        run_id = state.get("run_id") or uuid4().hex
+        prompt = assemble_prompt(
+            self.system_prompt,
+            shared=[f"[USER QUERY]: {state["user_query"]}"],
+            variable=[]
+        )
+        fallback = GenerateQueries(
             search_queries=[
                 QueryItem(query="", reason="The query generation has failed.")
             ]
         )
-        for _ in range(5):
-            try:
-                response = self.structured_llm.invoke(prompt)
-                break
-            except Exception as e:
-                logging.info(e)
-        search_queries = response.search_queries
+        response = self.structured_llm.invoke(prompt, fallback=fallback, deadline=state.get("deadline"))
+        search_queries = response.search_queries[:scaled(len(response.search_queries), search_budget_left(state))]
         logging.info(f"search_queries: {search_queries}")
-        return {"search_queries": search_queries, "search_iteration": search_iteration}
+        return {"search_queries": search_queries, "search_iteration": search_iteration, "run_id": run_id}
 
 class Researcher:
-    def __init__(self, model: str = "qwen3:8b", search_api: str = "ddgs"):
-        self.llm = ChatOllama(
+    def __init__(self, model: str = "qwen3:8b", search_api: str = SEARCH_API):
+        self.llm = CachedChatOllama(
             model=model,
-            num_predict=4096,
-            format="json"
+            cache=llm_cache("search"),
+            num_ctx=NUM_CTX,
+            keep_alive=OLLAMA_KEEP_ALIVE,
+            num_predict=4096
         )
-        self.structured_llm = self.llm.with_structured_output(Summarize)
+        self.structured_llm = StructuredLLM(self.llm, Summarize, node="search")
         self.system_prompt = SUMMARIZER_PROMPT
         self.search_api = SearchWrapper(api=search_api)
+        if RERANKER != "none":
+            # Loads the reranker in the background so the first search branch does not pay for it.
+            shared_reranker().warm()
+
+    def summarize(self, item: dict):
+        url = item["snippet"].metadata["url"]
+        prompt = assemble_prompt(
+            self.system_prompt,
+            shared=[f"[USER QUERY]: {item['user_query']}"],
+            variable=[f"[URL]: {url}", f"[PAGE SNIPPET]: {item['snippet'].page_content}"]
+        )
+        # Retries are per snippet so one bad response does not hold up the rest of the branch.
+        response = self.structured_llm.invoke(prompt, deadline=item["deadline"])
+        if response is None:
+            return None
+        return {"url": url, "summary": response.summary, "chunk_hash": item["snippet"].metadata["chunk_hash"]}
 
     def search(self, state: ResearcherState):
         logging.info("Entered in the 'search' node")
         search_query = state["search_query"]
-        urls, snippets = zip(*self.search_api.fetch(query=search_query))
+        results = self.search_api.fetch(query=search_query)
+        if not results:
+            return {"summaries": [], "search_results": []}
+        urls = [url for url, _ in results]
         existing_urls = [result["url"] for result in state["search_results"]] if state["search_results"] else []
-        scraped_data = [{"url": url, "content": self.search_api.scrape(url)} for url in urls if url not in existing_urls]
+        run_index = get_run_index(state["run_id"])
+        blob_store = get_blob_store(state["run_id"])
+        run_index.restore(
+            state["search_results"] or [], blob_store, claimed=state.get("claimed") or [],
+            queries=[state["user_query"], search_query], deadline=state.get("deadline")
+        )
+        # The state only knows earlier iterations' URLs, the run index also knows what sibling branches are scraping.
+        new_urls = run_index.reserve_urls([url for url in urls if url not in existing_urls])
+        timeout = BRANCH_SCRAPE_TIMEOUT
+        search_deadline = None
+        if state.get("deadline"):
+            # Scraping gives up when the search phase's share of the budget runs out, whatever is scraped by then is used.
+            search_deadline = state["deadline"] - WRITE_RESERVE * state["time_budget"]
+            timeout = min(timeout, max(2.0, search_deadline - time.time()))
+        scraped_data = [
+            {"url": url, "content": content} for url, content in self.search_api.scrape_many(new_urls, timeout=timeout)
+        ]
+        scraped_urls = {page["url"] for page in scraped_data if page["content"]}
+        run_index.release_urls([url for url in new_urls if url not in scraped_urls])
         if not scraped_data:
             logging.warning(f"No new content found for query: {search_query}")
             return {"summaries": [], "search_results": []}
-        vector_store =  create_vector_store(web_pages=scraped_data, snippets_size=5000)
-        top_k_snippets = get_top_k(query=state["user_query"], vector_store=vector_store, k=3)
-        summaries = []
-        for snippet in top_k_snippets:
-            for _ in range(5):
-                try:
-                    url = snippet.metadata["url"]
-                    content = snippet.page_content
-                    prompt = [
-                        SystemMessage(self.system_prompt),
-                        SystemMessage(f"[CURRENT DATE AND TIME]: {current_date}"),
-                        SystemMessage(f"[USER QUERY]: {state["user_query"]}"),
-                        SystemMessage(f"[URL]: {url}"),
-                        SystemMessage(f"[PAGE SNIPPET]: {content}")
-                    ]
-                    response = self.structured_llm.invoke(prompt)
-                    summaries.append({"url": url, "summary": response.summary})
-                    break
-                except Exception as e:
-                    logging.info(e)
-        logging.info(f"search_results: {scraped_data}")
+        run_index.add_pages(scraped_data, queries=[state["user_query"], search_query], deadline=search_deadline)
+        k = scaled(3, search_budget_left(state))
+        top_k_snippets = run_index.claim(
+            get_top_k(query=state["user_query"], index=run_index, k=k, deadline=search_deadline), k=k
+        )
+        summaries = RunnableLambda(self.summarize).batch(
+            [{"user_query": state["user_query"], "snippet": snippet, "deadline": search_deadline}
+             for snippet in top_k_snippets],
+            config={"max_concurrency": OLLAMA_NUM_PARALLEL}
+        )
+        summaries = [summary for summary in summaries if summary is not None]
+        # Page bodies go to the run's blob store, the state only keeps references to them.
+        search_results = [
+            {"url": page["url"], "content_hash": blob_store.put(page["content"]), "chars": len(page["content"])}
+            for page in scraped_data
+        ]
+        logging.info(f"search_results: {search_results}")
         logging.info(f"summaries: {summaries}")
-        return {"summaries": summaries, "search_results": scraped_data}
+        return {"summaries": summaries, "search_results": search_results}
 
 class Reviewer:
     def __init__(self, model: str = "qwen3:8b"):
-        self.llm = ChatOllama(
+        self.llm = CachedChatOllama(
             model=model,
-            format="json"
+            cache=llm_cache("review"),
+            num_ctx=NUM_CTX,
+            keep_alive=OLLAMA_KEEP_ALIVE,
+            num_predict=REVIEWER_NUM_PREDICT
         )
-        self.structured_llm = self.llm.with_structured_output(Review)
+        self.structured_llm = StructuredLLM(self.llm, Review, node="review")
         self.system_prompt = REVIEWER_PROMPT
 
     def is_search_complete(self, state: SystemState):
@@ -109,20 +223,22 @@ class Reviewer:
     def review(self, state: ReviewerState):
         logging.info("Entered in the 'review' node")
         search_iteration = state["search_iteration"]
-        response = Review(is_search_complete=False, justification="An error occurred during review.")
-        for _ in range(5):
-            try:
-                prompt = [
-                    SystemMessage(self.system_prompt),
-                    SystemMessage(f"[CURRENT DATE AND TIME]: {current_date}"),
-                    SystemMessage(f"[USER QUERY]: {state["user_query"]}"),
-                    SystemMessage(f"[SUMMARIES]: {state["summaries"]}"),
-                    SystemMessage(f"[SEARCH ITERATION]: {state["search_iteration"]}")
-                ]
-                response = self.structured_llm.invoke(prompt)
-                break
-            except Exception as e:
-                logging.info(e)
+        if state.get("deadline") and search_iteration:
+            # Another iteration is only started if one more takes no longer than the average one so far.
+            per_iteration = state["time_budget"] * (1 - budget_left(state)) / search_iteration
+            if search_budget_left(state) * (1 - WRITE_RESERVE) * state["time_budget"] < per_iteration:
+                justification = "Time budget reached, writing with the sources gathered so far."
+                logging.info(f"is_search_complete: True ({justification})")
+                return {"review": {"is_search_complete": True, "justification": justification}}
+        fallback = Review(is_search_complete=False, justification="An error occurred during review.")
+        budget = context_budget(NUM_CTX, REVIEWER_NUM_PREDICT, self.system_prompt, state["user_query"])
+        context = build_context(state["summaries"], user_query=state["user_query"], budget=budget)
+        prompt = assemble_prompt(
+            self.system_prompt,
+            shared=[f"[USER QUERY]: {state["user_query"]}", f"[SUMMARIES]:\n{context}"],
+            variable=[f"[SEARCH ITERATION]: {state["search_iteration"]}"]
+        )
+        response = self.structured_llm.invoke(prompt, fallback=fallback, deadline=state.get("deadline"))
         if search_iteration >= 3:
             is_search_complete = True
             justification = "Maximum search iteration reached. " + response.justification
@@ -136,28 +252,41 @@ class Reviewer:
 class Writer:
     # TODO Create a citation tool ?
     def __init__(self, model: str = "qwen3:14b"):
-        self.llm = ChatOllama(
+        self.llm = CachedChatOllama(
             model=model,
-            format="json"
+            cache=llm_cache("write"),
+            num_ctx=NUM_CTX,
+            keep_alive=OLLAMA_KEEP_ALIVE,
+            num_predict=WRITER_NUM_PREDICT
         )
-        self.structured_llm = self.llm.with_structured_output(Write)
         self.system_prompt = WRITER_PROMPT
+        self.samplers = {}
+        self.primer = PrefixPrimer(self.llm, node="write")
+
+    def sampler(self, draft_index: int):
+        # Each draft samples with its own temperature and seed so extra drafts are not near-duplicates.
+        # The seed is part of the cache key, so a cached draft replays its own sample rather than a sibling's.
+        if draft_index not in self.samplers:
+            llm = self.llm.model_copy(update={
+                "temperature": WRITER_TEMPERATURE + WRITER_TEMPERATURE_STEP * (draft_index % 4),
+                "seed": WRITER_SEED + draft_index
+            })
+            self.samplers[draft_index] = StructuredLLM(llm, Write, node="write")
+        return self.samplers[draft_index]
 
     def write(self, state: WriterState):
         logging.info("Entered in the 'write' node")
-        response = Write(report="An error occurred during the writing.", confidence="Low confidence due to system error.")
-        for _ in range(5):
-            try:
-                prompt = [
-                    SystemMessage(self.system_prompt),
-                    SystemMessage(f"[CURRENT DATE AND TIME]: {current_date}"),
-                    SystemMessage(f"[USER QUERY]: {state["user_query"]}"),
-                    SystemMessage(f"[SUMMARIES]: {state["summaries"]}")
-                ]
-                response = self.structured_llm.invoke(prompt)
-                break
-            except Exception as e:
-                logging.info(e)
+        structured_llm = self.sampler(state.get("draft_index", 0))
+        fallback = Write(report=WRITE_ERROR, confidence="Low confidence due to system error.")
+        budget = context_budget(NUM_CTX, WRITER_NUM_PREDICT, self.system_prompt, state["user_query"])
+        context = build_context(state["summaries"], user_query=state["user_query"], budget=budget)
+        prompt = assemble_prompt(
+            self.system_prompt,
+            shared=[f"[USER QUERY]: {state["user_query"]}", f"[SUMMARIES]:\n{context}"],
+            variable=[]
+        )
+        self.primer.prime(prompt[:1], deadline=state.get("deadline"))
+        response = structured_llm.invoke(prompt, fallback=fallback, deadline=state.get("deadline"))
         report = response.report
         confidence = response.confidence
         logging.info(f"report: {report}")
@@ -165,35 +294,36 @@ class Writer:
         return {"reports": [{"report": report, "confidence": confidence}]}
 
 class Evaluator:
-    def __init__(self, model: str = "qwen3:14b"):
-        self.llm = ChatOllama(
+    def __init__(self, model: str = "qwen3:14b", mode: str = EVALUATOR_MODE, wave_size: int = EVALUATOR_WAVE_SIZE,
+                 memory: ResearchMemory | None = None):
+        self.llm = CachedChatOllama(
             model=model,
-            format="json"
+            cache=llm_cache("evaluate"),
+            num_ctx=NUM_CTX,
+            keep_alive=OLLAMA_KEEP_ALIVE,
+            num_predict=EVALUATOR_NUM_PREDICT
         )
-        self.structured_llm = self.llm.with_structured_output(Evaluate)
+        self.structured_llm = StructuredLLM(self.llm, Evaluate, node="evaluate")
         self.system_prompt = EVALUATOR_PROMPT
+        self.primer = PrefixPrimer(self.llm, node="evaluate")
+        self.mode = mode
+        self.wave_size = wave_size
+        self.memory = memory
 
-    def grade_report(self, report_data, user_query, summaries):
-        response = Evaluate(
+    def grade_report(self, report_data, user_query, context, deadline: float | None = None):
+        fallback = Evaluate(
             faithfulness=GradeItem(grade=1, comment="An error occurred."),
             answer_relevance=GradeItem(grade=1, comment="An error occurred."),
             context_completeness=GradeItem(grade=1, comment="An error occurred."),
             formatting_quality=GradeItem(grade=1, comment="An error occurred."),
             synthesis_quality=GradeItem(grade=1, comment="An error occurred.")
         )
-        for _ in range(5):
-            try:
-                prompt = [
-                    SystemMessage(self.system_prompt),
-                    SystemMessage(f"[CURRENT DATE AND TIME]: {current_date}"),
-                    SystemMessage(f"[USER QUERY]: {user_query}"),
-                    SystemMessage(f"[SUMMARIES]: {summaries}"),
-                    SystemMessage(f"[REPORT]: {report_data}")
-                ]
-                response = self.structured_llm.invoke(prompt)
-                break
-            except Exception as e:
-                logging.info(e)
+        prompt = assemble_prompt(
+            self.system_prompt,
+            shared=[f"[USER QUERY]: {user_query}", f"[SUMMARIES]:\n{context}"],
+            variable=[f"[REPORT]: {report_data}"]
+        )
+        response = self.structured_llm.invoke(prompt, fallback=fallback, deadline=deadline)
         logging.info(f"grades: {response}")
         average_grade = sum(
             (
@@ -206,24 +336,105 @@ class Evaluator:
         ) / 5
         return average_grade
 
+    def prescreen(self, report: dict, summaries: list):
+        # Returns the best average grade the draft can still reach, or None if it is not worth grading.
+        text = report["report"].strip()
+        if not text or text == WRITE_ERROR:
+            return None
+        if not summaries:
+            return 10.0
+        # Compared normalized, so a trailing slash or a tracking parameter does not count as an unknown source.
+        cited = {normalize_url(url.rstrip(".")) for url in CITATION_PATTERN.findall(text)}
+        if not cited:
+            return None
+        if cited - {normalize_url(summary["url"]) for summary in summaries}:
+            # EVALUATOR_PROMPT caps faithfulness at 2 when a cited URL is not in the summaries.
+            return (2 + 4 * 10) / 5
+        return 10.0
+
+    def grade(self, report: dict, user_query: str, context: str, deadline: float | None = None) -> dict:
+        grade = {
+            "report": report["report"],
+            "grade": self.grade_report(report_data=report, user_query=user_query, context=context, deadline=deadline)
+        }
+        # Lets a streaming client show the best draft so far while the other drafts are still being graded.
+        emit({"type": "grade", **grade})
+        return grade
+
+    def grade_all(self, reports: list, user_query: str, context: str, deadline: float | None = None) -> list:
+        self.primer.prime(assemble_prompt(
+            self.system_prompt,
+            shared=[f"[USER QUERY]: {user_query}", f"[SUMMARIES]:\n{context}"],
+            variable=[]
+        )[:1], deadline=deadline)
+        return RunnableLambda(
+            lambda report: self.grade(report, user_query=user_query, context=context, deadline=deadline)
+        ).batch(reports, config={"max_concurrency": OLLAMA_NUM_PARALLEL})
+
     def evaluate(self, state: EvaluatorState):
         logging.info("Entered in the 'evaluate' node")
+        start = time.perf_counter()
+        reports = state["reports"][state.get("evaluated_drafts", 0):]
+        previous_grades = state.get("grades", [])
+        candidates = []
+        for report in reports:
+            upper_bound = self.prescreen(report, state["summaries"])
+            if upper_bound is not None:
+                candidates.append((upper_bound, report))
+        logging.info(f"prescreen kept {len(candidates)}/{len(reports)} drafts")
+        if candidates and state.get("deadline") and budget_left(state) <= 0:
+            # Past the deadline the best available report is returned without grading.
+            logging.info("Time budget exhausted, skipping grading")
+            candidates = []
+        # One context for every draft, sized for the longest one, keeps the grading prompts identical up to the report.
+        longest_draft = max((str(report) for _, report in candidates), key=len, default="")
+        budget = context_budget(NUM_CTX, EVALUATOR_NUM_PREDICT, self.system_prompt, state["user_query"], longest_draft)
+        context = build_context(state["summaries"], user_query=state["user_query"], budget=budget)
+
         grades = []
-        for report in state["reports"]:
-            grades.append(
-                {
-                    "report": report["report"],
-                    "grade": self.grade_report(
-                        report_data=report,
-                        user_query=state["user_query"],
-                        summaries=state["summaries"]
-                    )
-                }
+        if candidates and self.mode == "tournament":
+            candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+            for wave_start in range(0, len(candidates), self.wave_size):
+                wave = [report for _, report in candidates[wave_start:wave_start + self.wave_size]]
+                grades.extend(self.grade_all(wave, user_query=state["user_query"], context=context,
+                                             deadline=state.get("deadline")))
+                remaining = candidates[wave_start + self.wave_size:]
+                best_grade = max(grade["grade"] for grade in previous_grades + grades)
+                if remaining and best_grade >= max(upper_bound for upper_bound, _ in remaining):
+                    logging.info(f"Stopping early: {len(remaining)} drafts can no longer beat {best_grade}")
+                    break
+        elif candidates:
+            grades = self.grade_all(
+                [report for _, report in candidates],
+                user_query=state["user_query"],
+                context=context,
+                deadline=state.get("deadline")
             )
-        final_report = max(grades, key = lambda report: report["grade"])["report"]
+        best_grade = None
+        if previous_grades or grades:
+            best = max(previous_grades + grades, key = lambda report: report["grade"])
+            final_report, best_grade = best["report"], best["grade"]
+        else:
+            final_report = max(state["reports"], key=lambda report: len(report["report"].strip()))["report"]
+        release_run_index(state["run_id"])
+        release_blob_store(state["run_id"])
+        if self.memory is not None:
+            # Written after every wave, so the run is remembered with whichever report ends up final.
+            try:
+                self.memory.remember(state["run_id"], state["user_query"], state["summaries"], final_report, best_grade)
+            except Exception as e:
+                logging.warning(f"Could not remember run {state['run_id']}: {e}")
         logging.info(f"grades: {grades}")
+        logging.info(f"evaluate: graded {len(grades)}/{len(reports)} drafts in {time.perf_counter() - start:.1f}s")
         logging.info(f"final_report: {final_report}")
-        return {"final_report": final_report}
+        return {"final_report": final_report, "grades": grades, "evaluated_drafts": len(state["reports"])}
+
+def route_after_recall(state: SystemState):
+    if state.get("recalled_from"):
+        return END
+    if state.get("summaries"):
+        return "review"
+    return "generate_queries"
 
 def route_plan_to_search(state: SystemState):
     return [
@@ -232,7 +443,12 @@ def route_plan_to_search(state: SystemState):
              {
                  "search_query": query_item.query,
                  "user_query": state["user_query"],
-                 "search_results": state["search_results"] if "search_results" in state.keys() else []
+                 "run_id": state["run_id"],
+                 "search_results": state["search_results"] if "search_results" in state.keys() else [],
+                 # The chunks earlier iterations summarized, which a resumed run's rebuilt index must not hand out again.
+                 "claimed": [summary["chunk_hash"] for summary in state.get("summaries", []) if summary.get("chunk_hash")],
+                 "deadline": state.get("deadline"),
+                 "time_budget": state.get("time_budget")
              }
         ) for query_item in state["search_queries"]
     ]
@@ -241,27 +457,51 @@ def route_after_review(state: SystemState):
     is_search_complete = reviewer.is_search_complete(state)
 
     if is_search_complete:
-        return [Send("write", {
-            "summaries": state.get("summaries", []),
-            "user_query": state["user_query"]
-        }) for _ in range(5)]
+        # With less than the reserved share of the budget left, fewer drafts are written in parallel.
+        return send_drafts(state, first_draft=0, count=scaled(INITIAL_DRAFTS, write_budget_left(state)))
     else:
         return "generate_queries"
 
+def send_drafts(state: SystemState, first_draft: int, count: int):
+    return [Send("write", {
+        "summaries": state.get("summaries", []),
+        "user_query": state["user_query"],
+        "run_id": state["run_id"],
+        "draft_index": draft_index,
+        "deadline": state.get("deadline"),
+        "time_budget": state.get("time_budget")
+    }) for draft_index in range(first_draft, first_draft + count)]
+
+def route_after_evaluate(state: SystemState):
+    drafts = len(state["reports"])
+    best_grade = max((grade["grade"] for grade in state.get("grades", [])), default=0)
+    if best_grade >= DRAFT_GRADE_THRESHOLD or drafts >= MAX_DRAFTS or budget_left(state) < WRITE_RESERVE:
+        return END
+    logging.info(f"Best grade {best_grade} is below {DRAFT_GRADE_THRESHOLD}, requesting more drafts")
+    return send_drafts(state, first_draft=drafts, count=min(DRAFT_WAVE_SIZE, MAX_DRAFTS - drafts))
+
+memory = shared_memory() if MEMORY_ENABLED else None
+recaller = Recaller(memory=memory)
 query_generator = QueryGenerator()
 researcher = Researcher()
 reviewer = Reviewer()
 writer = Writer()
-evaluator = Evaluator()
+evaluator = Evaluator(memory=memory)
 
 graph = StateGraph(SystemState)
 
-graph.add_node("generate_queries", query_generator.generate_queries)
-graph.add_node("search", researcher.search)
-graph.add_node("review", reviewer.review)
-graph.add_node("write", writer.write)
-graph.add_node("evaluate", evaluator.evaluate)
+graph.add_node("recall", traced_node("recall", recaller.recall))
+graph.add_node("generate_queries", traced_node("generate_queries", query_generator.generate_queries))
+graph.add_node("search", traced_node("search", researcher.search))
+graph.add_node("review", traced_node("review", reviewer.review))
+graph.add_node("write", traced_node("write", writer.write))
+graph.add_node("evaluate", traced_node("evaluate", evaluator.evaluate))
 
+graph.add_conditional_edges(
+    "recall",
+    route_after_recall,
+    ["generate_queries", "review", END]
+)
 graph.add_conditional_edges(
     "generate_queries",
     route_plan_to_search,
@@ -274,10 +514,22 @@ graph.add_conditional_edges(
     ["write", "generate_queries"]
 )
 graph.add_edge("write", "evaluate")
-graph.add_edge("evaluate", END)
+graph.add_conditional_edges(
+    "evaluate",
+    route_after_evaluate,
+    ["write", END]
+)
+
+def create_checkpointer(path: str = CHECKPOINT_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    # Search branches finish on worker threads, the saver serializes its own writes.
+    checkpointer = SqliteSaver(sqlite3.connect(path, check_same_thread=False))
+    checkpointer.setup()
+    return checkpointer
 
-graph.set_entry_point("generate_queries")
-graph = graph.compile()
+graph.set_entry_point("recall")
+checkpointer = create_checkpointer() if CHECKPOINTS_ENABLED else None
+graph = graph.compile(checkpointer=checkpointer)
 
 """user_query = "Qui est le directeur artistique de Versace ?"
 
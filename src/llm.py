@@ -0,0 +1,404 @@
+import json
+import logging
+import os
+import re
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from langchain_core.caches import BaseCache
+from langchain_core.callbacks import BaseCallbackHandler, BaseCallbackManager
+from langchain_core.messages import AIMessage
+from langchain_core.load import dumps, loads
+from langchain_core.runnables import ensure_config
+from langchain_ollama import ChatOllama
+from pydantic import BaseModel, ValidationError
+
+from tracing import tracer, record_usage
+from utils import SQLiteStore
+from scheduler import model_scheduler
+from config import (
+    CACHE_DIR, LLM_CACHE_ENABLED, LLM_CACHE_MAX_ENTRIES, LLM_CACHE_TTL, LLM_CACHE_DISABLED_NODES,
+    LLM_MAX_ATTEMPTS, LLM_RETRY_BACKOFF, PREFIX_PRIMING, LLM_MIN_CALL_TIMEOUT, LLM_STALL_TIMEOUT,
+    LLM_EVAL_RATE
+)
+
+# Everything sent to Ollama that changes the response. keep_alive and the client settings do not and are left out.
+SAMPLING_OPTIONS = (
+    "mirostat", "mirostat_eta", "mirostat_tau", "num_ctx", "num_gpu", "num_thread", "num_predict",
+    "repeat_last_n", "repeat_penalty", "temperature", "seed", "stop", "tfs_z", "top_k", "top_p", "reasoning"
+)
+
+class CachedChatOllama(ChatOllama):
+    # ChatOllama is not LangChain-serializable, so its cache key (llm_string) is built from _identifying_params,
+    # which ChatOllama leaves empty: every model, seed and temperature would share one cache entry per prompt.
+    @property
+    def _identifying_params(self) -> dict:
+        return {"model": self.model, **{name: getattr(self, name) for name in SAMPLING_OPTIONS}}
+
+class SQLiteLLMCache(SQLiteStore, BaseCache):
+    # With CachedChatOllama, llm_string holds the model, its sampling options and the bound output schema,
+    # and prompt the serialized messages, so together they fully determine a response.
+    def __init__(
+            self,
+            path: str = os.path.join(CACHE_DIR, "llm.sqlite"),
+            max_entries: int = LLM_CACHE_MAX_ENTRIES,
+            ttl: float = LLM_CACHE_TTL
+    ):
+        super().__init__(path, [
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT, created_at REAL, accessed_at REAL)",
+            "CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)"
+        ])
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+    @staticmethod
+    def _key(prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+
+    def lookup(self, prompt: str, llm_string: str):
+        key = self._key(prompt, llm_string)
+        now = time.time()
+        with self.lock:
+            row = self.connection.execute("SELECT value, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or (self.ttl and now - row[1] > self.ttl):
+                self.misses += 1
+                tracer.count("llm_cache", result="miss")
+                return None
+            self.connection.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        tracer.count("llm_cache", result="hit")
+        return [loads(generation) for generation in json.loads(row[0])]
+
+    @staticmethod
+    def is_cacheable(return_val) -> bool:
+        # Every node asks for JSON; caching a malformed reply would make each retry replay the same failure.
+        try:
+            for generation in return_val:
+                json.loads(generation.text)
+        except ValueError:
+            return False
+        return True
+
+    def update(self, prompt: str, llm_string: str, return_val):
+        if not self.is_cacheable(return_val):
+            return
+        value = json.dumps([dumps(generation) for generation in return_val])
+        now = time.time()
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (self._key(prompt, llm_string), value, now, now)
+            )
+            self._evict()
+
+    def _evict(self):
+        count = self.connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        if count <= self.max_entries:
+            return
+        self.connection.execute(
+            "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY accessed_at LIMIT ?)",
+            (count - int(self.max_entries * self.EVICT_TO),)
+        )
+
+    def clear(self, **kwargs):
+        with self.lock:
+            self.connection.execute("DELETE FROM responses")
+
+@lru_cache(maxsize=None)
+def shared_llm_cache() -> SQLiteLLMCache:
+    return SQLiteLLMCache()
+
+def llm_cache(node: str):
+    # `False` rather than `None` so a global LangChain cache cannot re-enable caching for an opted-out node.
+    if not LLM_CACHE_ENABLED or node in LLM_CACHE_DISABLED_NODES:
+        return False
+    return shared_llm_cache()
+
+THINK_PATTERN = re.compile(r"<think>.*?(</think>|$)", re.DOTALL)
+FENCE_PATTERN = re.compile(r"```(?:json)?\s*(.*?)(```|$)", re.DOTALL)
+
+def close_json(text: str) -> str:
+    # Closes the strings, objects and arrays left open by a truncated generation.
+    stack = []
+    in_string = False
+    escaped = False
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]" and stack:
+            stack.pop()
+    if in_string:
+        text += '"'
+    text = text.rstrip()
+    if text.endswith(","):
+        text = text[:-1]
+    elif text.endswith(":"):
+        text += " null"
+    return text + "".join(reversed(stack))
+
+def parse_json(text: str):
+    text = THINK_PATTERN.sub("", text).strip()
+    fenced = FENCE_PATTERN.search(text)
+    if fenced:
+        text = fenced.group(1).strip()
+    start = text.find("{")
+    if start == -1:
+        return None
+    text = text[start:]
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    # Drop the last, partially written member until what is left can be closed into valid JSON.
+    while text:
+        try:
+            return json.loads(close_json(text))
+        except ValueError:
+            cut = max(text.rfind(",", 0, len(text) - 1), text.rfind("{", 0, len(text) - 1), text.rfind("[", 0, len(text) - 1))
+            if cut <= 0:
+                return None
+            text = text[:cut + 1] if text[cut] in "{[" else text[:cut]
+    return None
+
+JSON_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "b": "\b", "f": "\f"}
+
+def partial_json_string(text: str, key: str) -> str:
+    # Decodes the value of `key` from JSON that is still being generated, as far as it has been written.
+    matches = list(re.finditer(rf'(?<!\\)"{re.escape(key)}"\s*:\s*"', text))
+    if not matches:
+        return ""
+    chars = []
+    i = matches[-1].end()
+    while i < len(text) and text[i] != '"':
+        if text[i] != "\\":
+            chars.append(text[i])
+            i += 1
+            continue
+        if i + 1 >= len(text):
+            break
+        escaped = text[i + 1]
+        if escaped == "u":
+            code = text[i + 2:i + 6]
+            if len(code) < 4:
+                break
+            try:
+                chars.append(chr(int(code, 16)))
+            except ValueError:
+                pass
+            i += 6
+            continue
+        chars.append(JSON_ESCAPES.get(escaped, escaped))
+        i += 2
+    return "".join(chars)
+
+def patch_invalid(data, errors: list):
+    # Clamps out-of-range numbers, and gives fields a generation was cut off before an empty string, which
+    # only validates for text fields such as a truncated report's confidence.
+    for error in errors:
+        bound = error.get("ctx", {})
+        if error["type"] == "missing":
+            value = ""
+        elif error["type"] in ("greater_than_equal", "greater_than"):
+            value = bound.get("ge", bound.get("gt"))
+        elif error["type"] in ("less_than_equal", "less_than"):
+            value = bound.get("le", bound.get("lt"))
+        elif error["type"] == "int_from_float":
+            value = round(error["input"])
+        else:
+            continue
+        target = data
+        for key in error["loc"][:-1]:
+            target = target[key]
+        target[error["loc"][-1]] = value
+    return data
+
+def repair(text: str, schema: type[BaseModel]):
+    data = parse_json(text)
+    if data is None:
+        return None
+    try:
+        return schema.model_validate(data)
+    except ValidationError as e:
+        try:
+            return schema.model_validate(patch_invalid(data, e.errors()))
+        except (ValidationError, KeyError, IndexError, TypeError):
+            return None
+
+call_stats = {}
+call_stats_lock = threading.Lock()
+
+def record(node: str, **counts):
+    with call_stats_lock:
+        stats = call_stats.setdefault(node, {"calls": 0, "retries": 0, "repairs": 0, "failures": 0})
+        for name, count in counts.items():
+            stats[name] += count
+    for name, count in counts.items():
+        tracer.count(f"llm_{name}", count, node=node)
+
+def llm_call_stats() -> dict:
+    with call_stats_lock:
+        return {node: dict(stats) for node, stats in call_stats.items()}
+
+class TokenCollector(BaseCallbackHandler):
+    # Keeps the streamed tokens of a call and aborts the stream once stop_at has passed.
+    raise_error = True
+
+    def __init__(self, stop_at: float):
+        self.tokens = []
+        self.stop_at = stop_at
+
+    def on_llm_new_token(self, token: str, **kwargs):
+        self.tokens.append(token)
+        if time.time() >= self.stop_at:
+            raise TimeoutError("LLM call ran past its deadline")
+
+eval_rates = {}
+eval_rates_lock = threading.Lock()
+
+def record_eval_rate(model: str, span: dict):
+    # Moving average of the model's generation speed, used to size num_predict to the time a call has left.
+    if not span.get("eval_s") or not span.get("eval_tokens"):
+        return
+    rate = span["eval_tokens"] / span["eval_s"]
+    with eval_rates_lock:
+        eval_rates[model] = rate if model not in eval_rates else 0.8 * eval_rates[model] + 0.2 * rate
+
+class StructuredLLM:
+    def __init__(self, llm, schema: type[BaseModel], node: str,
+                 max_attempts: int = LLM_MAX_ATTEMPTS, backoff: float = LLM_RETRY_BACKOFF):
+        self.schema = schema
+        self.node = node
+        self.model = getattr(llm, "model", "unknown")
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.llm = llm
+        # Regenerations must not be answered from the response cache with the output that just failed.
+        self.retry_llm = llm.model_copy(update={"cache": False})
+        # Calls under a deadline are aborted from the token stream, and go through a copy of the model whose
+        # client gives up when Ollama sends nothing for LLM_STALL_TIMEOUT seconds.
+        self.bounded_llm = type(llm)(**{
+            **{name: getattr(llm, name) for name in llm.model_fields_set},
+            "sync_client_kwargs": {**(llm.sync_client_kwargs or {}), "timeout": LLM_STALL_TIMEOUT},
+        })
+        self.bounded_retry_llm = self.bounded_llm.model_copy(update={"cache": False})
+        # json_schema passes the Pydantic schema to Ollama's `format` for constrained decoding.
+        self.runnable = self.structured(self.llm)
+        self.retry_runnable = self.structured(self.retry_llm)
+
+    def structured(self, llm):
+        return llm.with_structured_output(self.schema, method="json_schema", include_raw=True)
+
+    def bounded(self, llm, deadline: float):
+        # num_predict is cut to what the model generates in the time left at its speed, so the generation
+        # usually ends on its own with JSON repair() can close.
+        timeout = max(LLM_MIN_CALL_TIMEOUT, deadline - time.time())
+        if not llm.num_predict:
+            return self.structured(llm)
+        with eval_rates_lock:
+            rate = eval_rates.get(self.model, LLM_EVAL_RATE)
+        return self.structured(llm.model_copy(update={"num_predict": max(64, min(llm.num_predict, int(timeout * rate)))}))
+
+    def invoke_bounded(self, llm, messages: list, deadline: float) -> dict:
+        runnable = self.bounded(llm, deadline)
+        collector = TokenCollector(stop_at=max(deadline, time.time() + LLM_MIN_CALL_TIMEOUT))
+        # The collector joins the callbacks inherited from the graph, which stream the tokens and trace the call.
+        config = ensure_config()
+        callbacks = config.get("callbacks")
+        if isinstance(callbacks, BaseCallbackManager):
+            callbacks = callbacks.copy()
+            callbacks.add_handler(collector)
+        else:
+            callbacks = [*(callbacks or []), collector]
+        try:
+            return runnable.invoke(messages, config={**config, "callbacks": callbacks})
+        except Exception as e:
+            if not collector.tokens:
+                raise
+            # Aborted at the deadline: the text generated so far goes to repair() like any other truncated reply.
+            return {"raw": AIMessage(content="".join(collector.tokens)), "parsed": None, "parsing_error": e}
+
+    def invoke(self, messages: list, fallback: BaseModel | None = None, deadline: float | None = None):
+        record(self.node, calls=1)
+        attempts = 0
+        for attempt in range(self.max_attempts):
+            if attempt:
+                delay = self.backoff * 2 ** (attempt - 1)
+                if deadline and time.time() + delay >= deadline:
+                    logging.info(f"{self.node}: deadline reached, not retrying")
+                    break
+                record(self.node, retries=1)
+                time.sleep(delay)
+            attempts += 1
+            try:
+                with model_scheduler.slot(self.model, deadline), \
+                        tracer.span(f"llm.{self.node}", model=self.model, attempt=attempt) as span:
+                    # Built once the slot is granted, so time spent queued for the model is not counted twice.
+                    if deadline:
+                        result = self.invoke_bounded(
+                            self.bounded_retry_llm if attempt else self.bounded_llm, messages, deadline
+                        )
+                    else:
+                        runnable = self.retry_runnable if attempt else self.runnable
+                        result = runnable.invoke(messages)
+                    record_usage(span, node=self.node, model=self.model, message=result["raw"])
+                    record_eval_rate(self.model, span)
+            except Exception as e:
+                logging.info(f"{self.node}: {e}")
+                continue
+            if result["parsed"] is not None:
+                return result["parsed"]
+            repaired = repair(result["raw"].content, self.schema)
+            if repaired is not None:
+                record(self.node, repairs=1)
+                return repaired
+            logging.info(f"{self.node}: {result['parsing_error']}")
+        record(self.node, failures=1)
+        logging.warning(f"{self.node}: no valid {self.schema.__name__} after {attempts} attempts")
+        return fallback
+
+class PrefixPrimer:
+    # Runs one prefill-only request per shared prefix before a fan-out, so the parallel calls that follow
+    # find the prefix in Ollama's KV cache instead of each prefilling it from scratch.
+    def __init__(self, llm, node: str, enabled: bool = PREFIX_PRIMING, max_prefixes: int = 64, timeout: float = 120):
+        self.llm = llm.model_copy(update={"num_predict": 1, "cache": False})
+        self.node = node
+        self.enabled = enabled
+        self.max_prefixes = max_prefixes
+        self.timeout = timeout
+        self.primed = OrderedDict()
+        self.lock = threading.Lock()
+
+    def prime(self, messages: list, deadline: float | None = None):
+        # Past the deadline the fan-out is better off starting right away than waiting for a prefill.
+        if not self.enabled or (deadline and time.time() >= deadline):
+            return
+        key = hashlib.sha256("\x00".join(str(message.content) for message in messages).encode("utf-8")).hexdigest()
+        with self.lock:
+            event = self.primed.get(key)
+            is_owner = event is None
+            if is_owner:
+                event = self.primed[key] = threading.Event()
+                while len(self.primed) > self.max_prefixes:
+                    self.primed.popitem(last=False)
+        if not is_owner:
+            event.wait(timeout=min(self.timeout, max(0.0, deadline - time.time())) if deadline else self.timeout)
+            return
+        model = getattr(self.llm, "model", "unknown")
+        try:
+            with model_scheduler.slot(model, deadline), tracer.span(f"llm.prime.{self.node}", model=model) as span:
+                record_usage(span, node=f"prime.{self.node}", model=span["model"], message=self.llm.invoke(messages))
+        except Exception as e:
+            logging.info(f"{self.node}: prefix priming failed: {e}")
+        finally:
+            event.set()
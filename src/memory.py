@@ -0,0 +1,104 @@
+import json
+import logging
+import time
+from functools import lru_cache
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from config import (
+    EMBEDDING_MODEL, MEMORY_PATH, MEMORY_MAX_RUNS, ANSWER_CACHE_THRESHOLD, ANSWER_CACHE_MAX_AGE, MEMORY_MIN_GRADE,
+    MEMORY_SEED_THRESHOLD, MEMORY_MAX_AGE, MEMORY_SEED_LIMIT
+)
+from tracing import tracer
+from utils import SQLiteStore, shared_embeddings, normalize_url
+
+class ResearchMemory(SQLiteStore):
+    # Finished runs kept across sessions: the query's embedding, the summaries with their URLs and the final report.
+    # New queries are compared to every past query by cosine similarity, which stays cheap at one row per run.
+    def __init__(self, path: str = MEMORY_PATH, embeddings: Embeddings | None = None, model: str = EMBEDDING_MODEL,
+                 max_runs: int = MEMORY_MAX_RUNS):
+        super().__init__(path, [
+            "CREATE TABLE IF NOT EXISTS runs (run_id TEXT PRIMARY KEY, model TEXT, user_query TEXT, vector BLOB, "
+            "summaries TEXT, final_report TEXT, grade REAL, finished_at REAL)",
+            "CREATE INDEX IF NOT EXISTS runs_finished_at ON runs (finished_at)"
+        ])
+        self.embeddings = embeddings or shared_embeddings(model)
+        self.model = model
+        self.max_runs = max_runs
+
+    def embed(self, text: str) -> np.ndarray:
+        vector = np.asarray(self.embeddings.embed_query(text), dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def search(self, user_query: str, k: int = 5) -> list:
+        with tracer.span("memory.search"):
+            vector = self.embed(user_query)
+            with self.lock:
+                rows = self.connection.execute("SELECT run_id, vector FROM runs WHERE model = ?", (self.model,)).fetchall()
+            if not rows:
+                return []
+            similarities = np.stack([np.frombuffer(row[1], dtype=np.float32) for row in rows]) @ vector
+            best = {rows[i][0]: float(similarities[i]) for i in np.argsort(-similarities)[:k]}
+            with self.lock:
+                matches = self.connection.execute(
+                    f"SELECT run_id, user_query, summaries, final_report, grade, finished_at FROM runs "
+                    f"WHERE run_id IN ({','.join('?' * len(best))})",
+                    tuple(best)
+                ).fetchall()
+        return sorted(
+            ({
+                "run_id": run_id,
+                "user_query": query,
+                "similarity": best[run_id],
+                "summaries": json.loads(summaries),
+                "final_report": final_report,
+                "grade": grade,
+                "finished_at": finished_at
+            } for run_id, query, summaries, final_report, grade, finished_at in matches),
+            key=lambda match: match["similarity"],
+            reverse=True
+        )
+
+    def answer(self, matches: list) -> dict | None:
+        now = time.time()
+        for match in matches:
+            if (match["similarity"] >= ANSWER_CACHE_THRESHOLD and (match["grade"] or 0) >= MEMORY_MIN_GRADE
+                    and now - match["finished_at"] <= ANSWER_CACHE_MAX_AGE):
+                return match
+        return None
+
+    def seed(self, matches: list) -> list:
+        # Each summary keeps the time it was first recorded, so reusing it in a later run does not make it fresh again.
+        now = time.time()
+        seen = set()
+        summaries = []
+        for match in matches:
+            if match["similarity"] < MEMORY_SEED_THRESHOLD:
+                continue
+            for summary in match["summaries"]:
+                key = (normalize_url(summary["url"]), summary["summary"])
+                if key in seen or now - summary["recorded_at"] > MEMORY_MAX_AGE:
+                    continue
+                seen.add(key)
+                summaries.append(summary)
+        return summaries[:MEMORY_SEED_LIMIT]
+
+    def remember(self, run_id: str, user_query: str, summaries: list, final_report: str, grade: float | None):
+        now = time.time()
+        summaries = [{**summary, "recorded_at": summary.get("recorded_at", now)} for summary in summaries]
+        vector = self.embed(user_query)
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO runs (run_id, model, user_query, vector, summaries, final_report, grade, finished_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (run_id, self.model, user_query, vector.tobytes(), json.dumps(summaries), final_report, grade, now)
+            )
+            self.connection.execute(
+                "DELETE FROM runs WHERE run_id NOT IN (SELECT run_id FROM runs ORDER BY finished_at DESC LIMIT ?)",
+                (self.max_runs,)
+            )
+        logging.info(f"Remembered run {run_id} with {len(summaries)} summaries")
+
+@lru_cache(maxsize=None)
+def shared_memory() -> ResearchMemory:
+    return ResearchMemory()
@@ -78,7 +78,7 @@ You are a Technical Research Synthesizer. Your goal is to compile all gathered r
 </REQUIREMENTS>
 
 <DATA_STRUCTURE>
-The [SUMMARIES] are provided as a list of objects: {"url": "...", "summary": "..."}. You must map the facts from "summary" to the corresponding "url".
+The [SUMMARIES] are provided as a numbered list of sources. Each source starts with a line "[n] <url>" followed by the facts extracted from that page, one per "- " line. You must map each fact to the url of the source it is listed under.
 </DATA_STRUCTURE>
 
 <EXAMPLE>
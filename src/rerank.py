@@ -0,0 +1,126 @@
+import hashlib
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from functools import lru_cache
+from langchain_core.documents import Document
+
+from tracing import tracer
+from config import RERANK_MODEL, RERANK_THREADS, RERANK_BATCH_WINDOW, RERANK_MAX_BATCH, RERANK_SCOPE
+
+def document_key(document: Document) -> str:
+    return document.metadata.get("chunk_hash") or hashlib.sha256(document.page_content.encode("utf-8")).hexdigest()
+
+class Reranker:
+    # One warm FlashRank model per process. Requests from concurrent search branches are collected for
+    # `window` seconds and scored together on a single worker, so branches never load the model or compete
+    # for cores on their own, and candidates shared by several branches are scored once.
+    def __init__(self, model: str = RERANK_MODEL, threads: int = RERANK_THREADS, window: float = RERANK_BATCH_WINDOW,
+                 max_batch: int = RERANK_MAX_BATCH, scope: str = RERANK_SCOPE):
+        self.model = model
+        self.threads = threads
+        self.window = window
+        self.max_batch = max_batch
+        self.scope = scope
+        self.ranker = None
+        self.load_lock = threading.Lock()
+        self.pending = queue.Queue()
+        threading.Thread(target=self.work, name="rerank", daemon=True).start()
+
+    def load(self):
+        with self.load_lock:
+            if self.ranker is not None:
+                return self.ranker
+            # Imported here so that RERANKER=none works without FlashRank installed.
+            from flashrank import Ranker
+            with tracer.span("flashrank.load", model=self.model):
+                ranker = Ranker(model_name=self.model)
+                if self.threads:
+                    self.set_threads(ranker)
+            self.ranker = ranker
+            return ranker
+
+    def set_threads(self, ranker):
+        import onnxruntime
+        session = getattr(ranker, "session", None)
+        if session is None:
+            return
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = self.threads
+        options.inter_op_num_threads = 1
+        ranker.session = onnxruntime.InferenceSession(session._model_path, options, providers=session.get_providers())
+
+    def warm(self):
+        threading.Thread(target=self.load, name="rerank-warmup", daemon=True).start()
+
+    def rerank(self, query: str, documents: list, k: int, run_id: str | None = None) -> list:
+        future = Future()
+        self.pending.put((query, run_id, documents, k, future))
+        with tracer.span("flashrank.rerank", candidates=len(documents), scope=self.scope):
+            return future.result()
+
+    def score(self, query: str, documents: list) -> list:
+        from flashrank import RerankRequest
+        passages = [{"id": i, "text": document.page_content} for i, document in enumerate(documents)]
+        scores = {result["id"]: float(result["score"]) for result in self.ranker.rerank(RerankRequest(query=query, passages=passages))}
+        return sorted(
+            (Document(page_content=document.page_content, metadata={**document.metadata, "relevance_score": scores[i]})
+             for i, document in enumerate(documents)),
+            key=lambda document: document.metadata["relevance_score"],
+            reverse=True
+        )
+
+    def work(self):
+        while True:
+            batch = [self.pending.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch and (remaining := deadline - time.monotonic()) > 0:
+                try:
+                    batch.append(self.pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            groups = {}
+            for request in batch:
+                # In run scope chunks are dealt out between the branches of one run only, so requests of
+                # different runs with the same query are kept apart.
+                groups.setdefault(request[:2] if self.scope == "run" else request[0], []).append(request)
+            for requests in groups.values():
+                try:
+                    self.load()
+                    self.answer(requests[0][0], requests)
+                except Exception as e:
+                    logging.warning(f"Reranking failed: {e}")
+                    for *_, future in requests:
+                        future.set_exception(e)
+
+    def answer(self, query: str, requests: list):
+        pool = {}
+        for _, _, documents, _, _ in requests:
+            for document in documents:
+                pool.setdefault(document_key(document), document)
+        with tracer.span("flashrank.batch", requests=len(requests), candidates=len(pool)):
+            ranked = self.score(query, list(pool.values()))
+        tracer.count("rerank_requests", len(requests))
+        tracer.count("rerank_scored", len(pool))
+        if self.scope == "run":
+            # The best documents of the merged pool are dealt out in turn, so no two branches get the same chunk.
+            results = [[] for _ in requests]
+            for turn, document in enumerate(ranked):
+                open_requests = [i for i, request in enumerate(requests) if len(results[i]) < request[3]]
+                if not open_requests:
+                    break
+                results[open_requests[turn % len(open_requests)]].append(document)
+        else:
+            ranks = {document_key(document): position for position, document in enumerate(ranked)}
+            results = [
+                [ranked[position] for position in sorted({ranks[document_key(document)] for document in documents})][:k]
+                for _, _, documents, k, _ in requests
+            ]
+        for (*_, future), documents in zip(requests, results):
+            future.set_result(documents)
+
+@lru_cache(maxsize=None)
+def shared_reranker() -> Reranker:
+    return Reranker()
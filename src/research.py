@@ -0,0 +1,136 @@
+import argparse
+import logging
+import time
+from datetime import datetime
+from functools import lru_cache
+from uuid import uuid4
+
+from config import RUN_TIME_BUDGET
+from graph import graph, checkpointer
+from scheduler import JobQueue
+from utils import save_report, release_run_index, release_blob_store, sweep_blob_stores
+
+def run_config(run_id: str) -> dict:
+    # The run_id doubles as the checkpoint thread, so traces and checkpoints of a run share one key.
+    return {"configurable": {"thread_id": run_id}, "recursion_limit": 100}
+
+def run_input(user_query: str, run_id: str, time_budget: float = RUN_TIME_BUDGET, deadline: float | None = None) -> dict:
+    # With a time budget the nodes scale their work to the time left and the run returns its best report by the deadline.
+    if not time_budget:
+        return {"user_query": user_query, "run_id": run_id}
+    return {
+        "user_query": user_query,
+        "run_id": run_id,
+        "time_budget": time_budget,
+        "deadline": deadline or time.time() + time_budget
+    }
+
+def rebase_deadline(run_id: str):
+    # A resumed run gets the budget it had left at its last checkpoint, counted from now, rather than a deadline
+    # that kept running while it was down. The pending fan-out is sent again with the new deadline.
+    snapshot = graph.get_state(run_config(run_id))
+    deadline = snapshot.values.get("deadline")
+    if not deadline:
+        return
+    unspent = max(0.0, deadline - datetime.fromisoformat(snapshot.created_at).timestamp())
+    graph.update_state(run_config(run_id), {"deadline": time.time() + unspent})
+
+def finish(run_id: str):
+    # Called however the run ended. The in-memory run index is always freed, a resumed run rebuilds it from the
+    # blob store. A run that reached END can no longer be resumed, so its page bodies and checkpoints go too.
+    release_run_index(run_id)
+    if checkpointer is None or not graph.get_state(run_config(run_id)).next:
+        release_blob_store(run_id)
+        if checkpointer is not None:
+            checkpointer.delete_thread(run_id)
+    sweep_blob_stores()
+
+def stream(user_query: str | None, run_id: str, stream_mode="updates", time_budget: float = RUN_TIME_BUDGET,
+           deadline: float | None = None):
+    # Without an input the graph continues the thread from its last checkpoint instead of starting over.
+    graph_input = run_input(user_query, run_id, time_budget, deadline) if user_query is not None else None
+    if graph_input is None and checkpointer is not None:
+        rebase_deadline(run_id)
+    try:
+        yield from graph.stream(graph_input, run_config(run_id), stream_mode=stream_mode)
+    finally:
+        finish(run_id)
+
+def research(user_query: str, run_id: str | None = None, time_budget: float = RUN_TIME_BUDGET) -> dict:
+    run_id = run_id or uuid4().hex
+    try:
+        return graph.invoke(run_input(user_query, run_id, time_budget), run_config(run_id))
+    finally:
+        finish(run_id)
+
+def resume(run_id: str) -> dict:
+    if checkpointer is None:
+        raise RuntimeError("Checkpoints are disabled, set CHECKPOINTS=1 to resume runs.")
+    snapshot = graph.get_state(run_config(run_id))
+    if not snapshot.values:
+        raise ValueError(f"No checkpoint found for run {run_id}.")
+    if not snapshot.next:
+        logging.info(f"Run {run_id} already finished")
+        return snapshot.values
+    logging.info(f"Resuming run {run_id} at {', '.join(snapshot.next)}")
+    rebase_deadline(run_id)
+    try:
+        return graph.invoke(None, run_config(run_id))
+    finally:
+        finish(run_id)
+
+def run_or_resume(user_query: str, run_id: str) -> dict:
+    if checkpointer is not None and graph.get_state(run_config(run_id)).values:
+        return resume(run_id)
+    return research(user_query, run_id=run_id)
+
+@lru_cache(maxsize=None)
+def shared_job_queue() -> JobQueue:
+    return JobQueue(stream)
+
+def unfinished_runs(limit: int = 10) -> list:
+    if checkpointer is None:
+        return []
+    # Only the newest threads are read, ordered by their latest checkpoint ID, which is time-ordered.
+    with checkpointer.cursor() as cursor:
+        run_ids = [row[0] for row in cursor.execute(
+            "SELECT thread_id FROM checkpoints WHERE checkpoint_ns = '' "
+            "GROUP BY thread_id ORDER BY MAX(checkpoint_id) DESC LIMIT ?",
+            (limit,)
+        ).fetchall()]
+    runs = []
+    for run_id in run_ids:
+        snapshot = graph.get_state(run_config(run_id))
+        if not snapshot.next:
+            # Finished before its checkpoints were pruned on completion.
+            checkpointer.delete_thread(run_id)
+            continue
+        runs.append({
+            "run_id": run_id,
+            "user_query": snapshot.values.get("user_query", ""),
+            "next": list(snapshot.next),
+            "updated_at": snapshot.created_at
+        })
+    return runs
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run or resume a deep research run from the command line.")
+    parser.add_argument("user_query", nargs="?", help="The research question")
+    parser.add_argument("--run-id", help="Thread ID for a new run, defaults to a random one")
+    parser.add_argument("--resume", metavar="RUN_ID", help="Resume an interrupted run from its last checkpoint")
+    parser.add_argument("--list", action="store_true", help="List interrupted runs")
+    parser.add_argument("--output", help="Also save the report to this file")
+    parser.add_argument("--time-budget", type=float, default=RUN_TIME_BUDGET,
+                        help="Seconds the run may take, 0 for no limit")
+    args = parser.parse_args()
+
+    if args.list:
+        for run in unfinished_runs():
+            print(f"{run['run_id']}  {run['updated_at']}  next={','.join(run['next'])}  {run['user_query']}")
+    elif args.resume or args.user_query:
+        final_state = resume(args.resume) if args.resume else research(args.user_query, run_id=args.run_id, time_budget=args.time_budget)
+        print(final_state["final_report"])
+        if args.output:
+            save_report(user_query=final_state["user_query"], report=final_state["final_report"], file_name=args.output)
+    else:
+        parser.error("a user query, --resume or --list is required")
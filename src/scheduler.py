@@ -0,0 +1,181 @@
+import heapq
+import logging
+import queue
+import time
+import threading
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+from tracing import tracer
+from config import (
+    MODEL_CONCURRENCY, OLLAMA_NUM_PARALLEL, OLLAMA_MAX_LOADED_MODELS, MODEL_SWITCH_AFTER, MAX_ACTIVE_RUNS,
+    RUN_ETA_DEFAULT
+)
+
+class ModelScheduler:
+    # Process-wide gate in front of Ollama, shared by every run: each model gets its own in-flight limit, and
+    # calls are grouped by model so Ollama is not made to swap models in and out between interleaved runs.
+    def __init__(self, limits: dict = MODEL_CONCURRENCY, default_limit: int = OLLAMA_NUM_PARALLEL,
+                 max_loaded: int = OLLAMA_MAX_LOADED_MODELS, switch_after: float = MODEL_SWITCH_AFTER):
+        self.limits = limits
+        self.default_limit = default_limit
+        self.max_loaded = max_loaded
+        self.switch_after = switch_after
+        self.condition = threading.Condition()
+        self.in_flight = defaultdict(int)
+        self.waiting = defaultdict(list)
+
+    def limit(self, model: str) -> int:
+        return self.limits.get(model, self.default_limit)
+
+    def starving(self, model: str, now: float) -> bool:
+        return any(
+            other != model and waits and not self.in_flight[other] and now - min(waits) > self.switch_after
+            for other, waits in self.waiting.items()
+        )
+
+    def can_run(self, model: str, now: float) -> bool:
+        if self.in_flight[model] >= self.limit(model):
+            return False
+        active = [other for other, count in self.in_flight.items() if count]
+        if model in active:
+            # Same-model work keeps joining the current batch, unless another model has waited too long
+            # and needs the loaded models to drain so it can be swapped in.
+            return len(active) < self.max_loaded or not self.starving(model, now)
+        return len(active) < self.max_loaded
+
+    @contextmanager
+    def slot(self, model: str, deadline: float | None = None):
+        # A caller with a deadline gives up with TimeoutError once it passes instead of waiting on.
+        with self.condition:
+            since = time.monotonic()
+            self.waiting[model].append(since)
+            try:
+                # Timed waits because a waiter becomes starving just by waiting, without anyone notifying.
+                while not self.can_run(model, time.monotonic()):
+                    if deadline and time.time() >= deadline:
+                        tracer.count("scheduler_timeouts", model=model)
+                        raise TimeoutError(f"No {model} slot free before the deadline")
+                    self.condition.wait(timeout=min(1, deadline - time.time()) if deadline else 1)
+            finally:
+                self.waiting[model].remove(since)
+            self.in_flight[model] += 1
+        tracer.count("scheduler_wait_seconds", time.monotonic() - since, model=model)
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.in_flight[model] -= 1
+                self.condition.notify_all()
+
+    def stats(self) -> dict:
+        with self.condition:
+            return {
+                model: {"in_flight": self.in_flight[model], "waiting": len(self.waiting[model]), "limit": self.limit(model)}
+                for model in set(self.in_flight) | set(self.waiting)
+            }
+
+model_scheduler = ModelScheduler()
+
+class Job:
+    def __init__(self, user_query: str, run_id: str, resume: bool, stream_mode, time_budget: float = 0):
+        self.user_query = user_query
+        self.run_id = run_id
+        self.resume = resume
+        self.stream_mode = stream_mode
+        self.time_budget = time_budget
+        self.status = "queued"
+        self.error = None
+        self.events = queue.Queue()
+        self.submitted_at = time.time()
+        # The budget counts from submission, so time spent queued is part of it.
+        self.deadline = self.submitted_at + time_budget if time_budget else None
+        self.started_at = None
+        self.finished_at = None
+
+    def stream(self):
+        # Yields the graph's stream events as the worker produces them, then re-raises the run's error if any.
+        while (event := self.events.get()) is not None:
+            yield event
+        if self.error is not None:
+            raise self.error
+
+class JobQueue:
+    # Admits at most `max_active` runs at once and queues the rest in FIFO order. Runs execute on worker threads,
+    # so one that outlives its browser tab still finishes and lands in the checkpoints.
+    def __init__(self, run, max_active: int = MAX_ACTIVE_RUNS, eta_default: float = RUN_ETA_DEFAULT):
+        self.run = run
+        self.max_active = max_active
+        self.run_seconds = eta_default
+        self.condition = threading.Condition()
+        self.queued = deque()
+        self.running = []
+        for worker in range(max_active):
+            threading.Thread(target=self.work, name=f"job-worker-{worker}", daemon=True).start()
+
+    def submit(self, user_query: str, run_id: str, resume: bool = False, stream_mode="updates",
+               time_budget: float = 0) -> Job:
+        job = Job(user_query, run_id=run_id, resume=resume, stream_mode=stream_mode, time_budget=time_budget)
+        with self.condition:
+            self.queued.append(job)
+            self.condition.notify()
+        tracer.count("jobs_submitted")
+        return job
+
+    def work(self):
+        while True:
+            with self.condition:
+                while not self.queued:
+                    self.condition.wait()
+                job = self.queued.popleft()
+                job.status = "running"
+                job.started_at = time.time()
+                self.running.append(job)
+            try:
+                events = self.run(
+                    None if job.resume else job.user_query, job.run_id, stream_mode=job.stream_mode,
+                    time_budget=job.time_budget, deadline=job.deadline
+                )
+                for event in events:
+                    job.events.put(event)
+                job.status = "done"
+            except Exception as e:
+                logging.warning(f"Run {job.run_id} failed: {e}")
+                job.error = e
+                job.status = "failed"
+            finally:
+                with self.condition:
+                    job.finished_at = time.time()
+                    self.running.remove(job)
+                    if job.status == "done":
+                        # Moving average so the ETA follows the current load and cache hit rate.
+                        self.run_seconds = 0.8 * self.run_seconds + 0.2 * (job.finished_at - job.started_at)
+                tracer.count("jobs_finished", status=job.status)
+                job.events.put(None)
+
+    def active_runs(self) -> set:
+        with self.condition:
+            return {job.run_id for job in list(self.queued) + self.running}
+
+    def position(self, job: Job) -> int:
+        with self.condition:
+            return self.queued.index(job) + 1 if job in self.queued else 0
+
+    def eta(self, job: Job) -> float:
+        # Seconds until the job is expected to finish, replaying the queue ahead of it over the worker slots.
+        now = time.time()
+        with self.condition:
+            if job.status == "running":
+                return max(0.0, self.run_seconds - (now - job.started_at))
+            if job.status != "queued":
+                return 0.0
+            slots = [max(0.0, self.run_seconds - (now - running.started_at)) for running in self.running]
+            slots += [0.0] * (self.max_active - len(slots))
+            heapq.heapify(slots)
+            start = 0.0
+            for queued in self.queued:
+                start = heapq.heappop(slots)
+                heapq.heappush(slots, start + self.run_seconds)
+                if queued is job:
+                    break
+            return start + self.run_seconds
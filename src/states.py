@@ -4,36 +4,65 @@ import operator
 
 class SystemState(TypedDict):
     user_query: str
+    run_id: str
     search_queries: List[dict[str, str]]
-    search_results : Annotated[List[dict[str, str]], operator.add]
+    search_results : Annotated[List[dict[str, Any]], operator.add]
     summaries : Annotated[List[dict[str, str]], operator.add]
     review: dict[str, str]
     reports: Annotated[List[dict[str, Any]], operator.add]
+    grades: Annotated[List[dict[str, Any]], operator.add]
+    evaluated_drafts: int
     final_report: str
     search_iteration: int
+    deadline: float
+    time_budget: float
+    recalled_from: str
+
+class RecallState(TypedDict):
+    user_query: str
+    run_id: str
 
 class QueryGeneratorState(TypedDict):
     user_query : str
+    run_id: str
     search_iteration: int
+    deadline: float
+    time_budget: float
 
 class ResearcherState(TypedDict):
     user_query: str
+    run_id: str
     search_query: str
-    search_results: Annotated[List[dict[str, str]], operator.add]
+    search_results: Annotated[List[dict[str, Any]], operator.add]
+    claimed: List[str]
+    deadline: float
+    time_budget: float
 
 class ReviewerState(TypedDict):
     summaries: List[dict[str, str]]
     user_query: str
+    run_id: str
     search_iteration: int
+    deadline: float
+    time_budget: float
 
 class WriterState(TypedDict):
     summaries : List[dict[str, str]]
     user_query: str
+    run_id: str
+    draft_index: int
+    deadline: float
+    time_budget: float
 
 class EvaluatorState(TypedDict):
     reports: List[dict[str, Any]]
+    grades: List[dict[str, Any]]
+    evaluated_drafts: int
     summaries: List[dict[str, str]]
     user_query: str
+    run_id: str
+    deadline: float
+    time_budget: float
 
 class QueryItem(BaseModel):
     query: str = Field(description="The keyword-optimized search string.")
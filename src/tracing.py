@@ -0,0 +1,156 @@
+import json
+import os
+import time
+import threading
+import contextvars
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config import TRACE_PATH, TRACE_MAX_RUNS
+
+current_run = contextvars.ContextVar("current_run", default=None)
+
+class Tracer:
+    def __init__(self, path: str = TRACE_PATH, max_runs: int = TRACE_MAX_RUNS):
+        self.path = path
+        self.max_runs = max_runs
+        self.lock = threading.Lock()
+        # Writing the export file has its own lock, so spans and counters are not held up by disk I/O.
+        self.file_lock = threading.Lock()
+        self.runs = OrderedDict()
+        self.durations = defaultdict(lambda: [0.0, 0])
+        self.counters = defaultdict(float)
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        span = {
+            "run_id": current_run.get(),
+            "name": name,
+            "start": time.time(),
+            "thread": threading.current_thread().name,
+            **attributes
+        }
+        start = time.perf_counter()
+        try:
+            yield span
+        except Exception as e:
+            span["error"] = repr(e)
+            raise
+        finally:
+            span["duration"] = time.perf_counter() - start
+            self.finish(span)
+
+    def finish(self, span: dict):
+        with self.lock:
+            totals = self.durations[span["name"]]
+            totals[0] += span["duration"]
+            totals[1] += 1
+            if span["run_id"]:
+                self.runs.setdefault(span["run_id"], []).append(span)
+                self.runs.move_to_end(span["run_id"])
+                while len(self.runs) > self.max_runs:
+                    self.runs.popitem(last=False)
+        if self.path:
+            line = json.dumps(span, default=str) + "\n"
+            with self.file_lock, open(self.path, "a") as f:
+                f.write(line)
+
+    def count(self, name: str, value: float = 1, **labels):
+        with self.lock:
+            self.counters[(name, tuple(sorted(labels.items())))] += value
+
+    def spans(self, run_id: str) -> list:
+        with self.lock:
+            return list(self.runs.get(run_id, []))
+
+    def breakdown(self, run_id: str) -> list:
+        rows = {}
+        for span in self.spans(run_id):
+            row = rows.setdefault(span["name"], {"name": span["name"], "calls": 0, "total_s": 0.0, "max_s": 0.0,
+                                                 "prompt_tokens": 0, "eval_tokens": 0})
+            row["calls"] += 1
+            row["total_s"] += span["duration"]
+            row["max_s"] = max(row["max_s"], span["duration"])
+            row["prompt_tokens"] += span.get("prompt_tokens") or 0
+            row["eval_tokens"] += span.get("eval_tokens") or 0
+        for row in rows.values():
+            row["mean_s"] = row["total_s"] / row["calls"]
+        return sorted(rows.values(), key=lambda row: row["total_s"], reverse=True)
+
+    def render_prometheus(self) -> str:
+        lines = [
+            "# HELP deep_research_span_seconds Time spent in traced spans.",
+            "# TYPE deep_research_span_seconds summary"
+        ]
+        with self.lock:
+            for name, (total, count) in sorted(self.durations.items()):
+                lines.append(f'deep_research_span_seconds_sum{{name="{name}"}} {total}')
+                lines.append(f'deep_research_span_seconds_count{{name="{name}"}} {count}')
+            metrics = defaultdict(list)
+            for (name, labels), value in self.counters.items():
+                metrics[name].append((labels, value))
+        for name, samples in sorted(metrics.items()):
+            lines.append(f"# TYPE deep_research_{name}_total counter")
+            for labels, value in samples:
+                rendered = ",".join(f'{key}="{label}"' for key, label in labels)
+                lines.append(f"deep_research_{name}_total{{{rendered}}} {value}")
+        return "\n".join(lines) + "\n"
+
+tracer = Tracer()
+
+def traced(name: str):
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with tracer.span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def traced_node(name: str, function):
+    @wraps(function)
+    def wrapper(state):
+        token = current_run.set(state.get("run_id"))
+        try:
+            with tracer.span(f"node.{name}") as span:
+                result = function(state)
+                if not span["run_id"] and isinstance(result, dict):
+                    span["run_id"] = result.get("run_id")
+                return result
+        finally:
+            current_run.reset(token)
+    return wrapper
+
+def record_usage(span: dict, node: str, model: str, message):
+    # Ollama reports token counts and durations (in nanoseconds) in the response metadata.
+    metadata = getattr(message, "response_metadata", None) or {}
+    span["prompt_tokens"] = metadata.get("prompt_eval_count") or 0
+    span["eval_tokens"] = metadata.get("eval_count") or 0
+    span["prompt_eval_s"] = (metadata.get("prompt_eval_duration") or 0) / 1e9
+    span["eval_s"] = (metadata.get("eval_duration") or 0) / 1e9
+    span["load_s"] = (metadata.get("load_duration") or 0) / 1e9
+    tracer.count("llm_prompt_tokens", span["prompt_tokens"], node=node, model=model)
+    tracer.count("llm_eval_tokens", span["eval_tokens"], node=node, model=model)
+    tracer.count("llm_prompt_eval_seconds", span["prompt_eval_s"], node=node, model=model)
+    tracer.count("llm_eval_seconds", span["eval_s"], node=node, model=model)
+
+def serve_prometheus(port: int) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = tracer.render_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -1,84 +1,954 @@
-from ddgs.exceptions import DDGSException
 import logging
 import requests
 import os
+import re
+import random
+import math
+import heapq
+import shutil
+import time
+import zlib
+import sqlite3
+import codecs
+import hashlib
+import threading
+import contextvars
+from functools import lru_cache
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from itertools import zip_longest
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from requests.adapters import HTTPAdapter
+import numpy as np
+import faiss
 from ddgs import DDGS
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 from langchain_ollama import OllamaEmbeddings
 from langchain_community.vectorstores import FAISS
-from langchain_community.document_compressors import FlashrankRerank
-from langchain_classic.retrievers import ContextualCompressionRetriever
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
+from tracing import tracer, traced
+from extract import MarkdownExtractor
+from rerank import shared_reranker
+from dedupe import simhash, SimHashIndex
+from scheduler import model_scheduler
+from config import (
+    JINA_READER_URL, JINA_API_KEY, SCRAPER, SCRAPE_MAX_BYTES, SCRAPE_TIMEOUT, BRANCH_SCRAPE_TIMEOUT, SCRAPE_WORKERS, SCRAPE_PER_HOST,
+    CACHE_DIR, BLOB_DIR, BLOB_MAX_AGE, SCRAPE_CACHE_ENABLED, SCRAPE_CACHE_TTL, SCRAPE_CACHE_STALE_TTL, SCRAPE_CACHE_MAX_BYTES,
+    EMBEDDING_MODEL, EMBEDDING_BATCH_SIZE, EMBEDDING_CACHE_ENABLED, NEAR_DUPLICATES_ENABLED, PREFILTER,
+    PREFILTER_FRACTION, PREFILTER_MIN_CHUNKS, RRF_K, HNSW_THRESHOLD, HNSW_M, HNSW_EF_SEARCH,
+    SEARXNG_URL, SEARCH_TIMEOUT, SEARCH_PROVIDERS, SEARCH_MODE, SEARCH_HEDGE_DELAY, SEARCH_BREAKER_FAILURES,
+    SEARCH_BREAKER_COOLDOWN, RERANKER
+)
+
+TRACKING_PARAMS = ("utm_", "fbclid", "gclid", "mc_cid", "mc_eid", "_hsenc", "_hsmi")
+
+def normalize_url(url: str) -> str:
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower() or "https"
+    host = (parts.hostname or "").lower()
+    if parts.port and (scheme, parts.port) not in (("http", 80), ("https", 443)):
+        host = f"{host}:{parts.port}"
+    path = parts.path.rstrip("/") or "/"
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith(TRACKING_PARAMS)
+    ))
+    return urlunsplit((scheme, host, path, query, ""))
+
+class SQLiteStore:
+    # One SQLite file per store, shared by every thread of the process through a single autocommit connection
+    # in WAL mode, with `lock` held around each use of it. Subclasses pass the statements creating their schema.
+    # Size-capped stores evict down to EVICT_TO of their cap, so that a full store does not evict on every write.
+    EVICT_TO = 0.9
+
+    def __init__(self, path: str, schema: list):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        for statement in schema:
+            self.connection.execute(statement)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+class ScrapeCache(SQLiteStore):
+    def __init__(
+            self,
+            path: str = os.path.join(CACHE_DIR, "scrape.sqlite"),
+            ttl: float = SCRAPE_CACHE_TTL,
+            stale_ttl: float = SCRAPE_CACHE_STALE_TTL,
+            max_bytes: int = SCRAPE_CACHE_MAX_BYTES
+    ):
+        # Pages point at compressed blobs addressed by their content hash, so mirrored pages are stored once.
+        super().__init__(path, [
+            "CREATE TABLE IF NOT EXISTS pages (url TEXT PRIMARY KEY, content_hash TEXT, fetched_at REAL, accessed_at REAL)",
+            "CREATE TABLE IF NOT EXISTS blobs (content_hash TEXT PRIMARY KEY, data BLOB, size INTEGER)",
+            "CREATE INDEX IF NOT EXISTS pages_accessed_at ON pages (accessed_at)"
+        ])
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_bytes = max_bytes
+        self.refreshing = set()
+        self.stale_hits = 0
+        self.evictions = 0
+
+    def get(self, url: str) -> tuple:
+        key = normalize_url(url)
+        now = time.time()
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT p.fetched_at, b.data FROM pages p JOIN blobs b USING (content_hash) WHERE p.url = ?",
+                (key,)
+            ).fetchone()
+            if row is None or now - row[0] > self.ttl + self.stale_ttl:
+                self.misses += 1
+                tracer.count("scrape_cache", result="miss")
+                return None, False
+            self.connection.execute("UPDATE pages SET accessed_at = ? WHERE url = ?", (now, key))
+            is_stale = now - row[0] > self.ttl
+            if is_stale:
+                self.stale_hits += 1
+            else:
+                self.hits += 1
+        tracer.count("scrape_cache", result="stale" if is_stale else "hit")
+        return zlib.decompress(row[1]).decode("utf-8"), is_stale
+
+    def put(self, url: str, content: str):
+        key = normalize_url(url)
+        raw = content.encode("utf-8")
+        content_hash = hashlib.sha256(raw).hexdigest()
+        data = zlib.compress(raw, 6)
+        now = time.time()
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR IGNORE INTO blobs (content_hash, data, size) VALUES (?, ?, ?)",
+                (content_hash, data, len(data))
+            )
+            self.connection.execute(
+                "INSERT OR REPLACE INTO pages (url, content_hash, fetched_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, content_hash, now, now)
+            )
+            self._evict()
+
+    def _evict(self):
+        total = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        self.connection.execute("DELETE FROM blobs WHERE content_hash NOT IN (SELECT content_hash FROM pages)")
+        total = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+        target = self.max_bytes * self.EVICT_TO
+        lru_pages = self.connection.execute("SELECT url, content_hash FROM pages ORDER BY accessed_at").fetchall()
+        for url, content_hash in lru_pages:
+            if total <= target:
+                break
+            self.connection.execute("DELETE FROM pages WHERE url = ?", (url,))
+            self.evictions += 1
+            if self.connection.execute("SELECT 1 FROM pages WHERE content_hash = ?", (content_hash,)).fetchone():
+                continue
+            size = self.connection.execute("SELECT size FROM blobs WHERE content_hash = ?", (content_hash,)).fetchone()
+            self.connection.execute("DELETE FROM blobs WHERE content_hash = ?", (content_hash,))
+            total -= size[0] if size else 0
+
+    def start_refresh(self, url: str) -> bool:
+        key = normalize_url(url)
+        with self.lock:
+            if key in self.refreshing:
+                return False
+            self.refreshing.add(key)
+            return True
+
+    def end_refresh(self, url: str):
+        with self.lock:
+            self.refreshing.discard(normalize_url(url))
+
+    def stats(self) -> dict:
+        with self.lock:
+            pages, size = self.connection.execute(
+                "SELECT (SELECT COUNT(*) FROM pages), (SELECT COALESCE(SUM(size), 0) FROM blobs)"
+            ).fetchone()
+            return {
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "pages": pages,
+                "bytes": size
+            }
+
+@lru_cache(maxsize=None)
+def shared_scrape_cache() -> ScrapeCache:
+    return ScrapeCache()
+
+def create_session(pool_size: int = SCRAPE_WORKERS) -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+class ScrapePool:
+    def __init__(self, max_workers: int = SCRAPE_WORKERS, per_host: int = SCRAPE_PER_HOST):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="scrape")
+        self.per_host = per_host
+        self.host_slots = {}
+        self.lock = threading.Lock()
+
+    def _slot(self, url: str):
+        host = urlsplit(url).netloc.lower()
+        with self.lock:
+            if host not in self.host_slots:
+                self.host_slots[host] = threading.BoundedSemaphore(self.per_host)
+            return self.host_slots[host]
+
+    def _run(self, scrape, url: str):
+        with self._slot(url):
+            return scrape(url)
+
+    def map(self, scrape, urls: list, timeout: float = BRANCH_SCRAPE_TIMEOUT) -> list:
+        # Pages still running when the branch timeout expires are dropped, the rest are returned.
+        futures = [
+            (url, self.executor.submit(contextvars.copy_context().run, self._run, scrape, url)) for url in urls
+        ]
+        done, not_done = wait([future for _, future in futures], timeout=timeout)
+        for future in not_done:
+            future.cancel()
+        results = []
+        for url, future in futures:
+            if future not in done:
+                logging.warning(f"Scrape timed out after {timeout}s: {url}")
+                continue
+            try:
+                results.append((url, future.result()))
+            except Exception as e:
+                logging.warning(f"Scrape failed for {url}: {e}")
+        return results
+
+class ProviderHealth:
+    # Latency and circuit breaker of one search provider. After `max_failures` errors in a row the circuit opens
+    # and the provider is skipped for `cooldown` seconds, then a single trial call decides whether it closes again.
+    def __init__(self, name: str, max_failures: int = SEARCH_BREAKER_FAILURES, cooldown: float = SEARCH_BREAKER_COOLDOWN):
+        self.name = name
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self.latency = None
+        self.failures = 0
+        self.open_until = 0.0
+        self.trial = False
+        self.calls = 0
+        self.errors = 0
+        self.lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self.lock:
+            if self.failures < self.max_failures:
+                return True
+            if time.monotonic() < self.open_until or self.trial:
+                return False
+            self.trial = True
+            return True
+
+    def record(self, seconds: float, ok: bool):
+        with self.lock:
+            self.calls += 1
+            self.trial = False
+            if ok:
+                self.failures = 0
+                self.latency = seconds if self.latency is None else 0.8 * self.latency + 0.2 * seconds
+            else:
+                self.errors += 1
+                self.failures += 1
+                if self.failures >= self.max_failures:
+                    if self.failures == self.max_failures:
+                        logging.warning(f"Search provider {self.name} failed {self.failures} times, skipping it for {self.cooldown}s")
+                    self.open_until = time.monotonic() + self.cooldown
+        tracer.count("search_calls", provider=self.name, status="ok" if ok else "error")
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "calls": self.calls,
+                "errors": self.errors,
+                "latency_s": self.latency,
+                "circuit": "open" if self.failures >= self.max_failures else "closed"
+            }
+
 class SearchWrapper:
-    def __init__(self, api):
+    def __init__(self, api, cache: bool = SCRAPE_CACHE_ENABLED, scraper: str = SCRAPER, providers: list | None = None,
+                 mode: str = SEARCH_MODE, hedge_delay: float = SEARCH_HEDGE_DELAY, timeout: float = SEARCH_TIMEOUT):
+        readers = {
+            "jina": JinaReader,
+            "local": LocalReader
+        }
+        reader = readers[scraper]()
         self.registry = {
-            "ddgs": DDGSearch()
+            "ddgs": lambda: DDGSearch(reader=reader),
+            "searxng": lambda: SearxSearch(reader=reader),
+            "stub": lambda: StubSearch(reader=reader)
         }
-        self.api = self.registry[api]
+        # Providers are given by registry name or as instances, so tests can plug in their own.
+        providers = providers or [api] + [name for name in SEARCH_PROVIDERS if name != api]
+        self.providers = [self.registry[provider]() if isinstance(provider, str) else provider for provider in providers]
+        self.api = self.providers[0]
+        self.health = {provider.name: ProviderHealth(provider.name) for provider in self.providers}
+        self.mode = mode
+        self.hedge_delay = hedge_delay
+        self.timeout = timeout
+        self.search_pool = ThreadPoolExecutor(max_workers=4 * len(self.providers), thread_name_prefix="search")
+        self.scrape_pool = ScrapePool()
+        self.cache = shared_scrape_cache() if cache else None
+
+    def _call(self, provider, query: str, max_results: int) -> list:
+        health = self.health[provider.name]
+        start = time.monotonic()
+        try:
+            results = provider.fetch(query=query, max_results=max_results)
+        except Exception as e:
+            health.record(time.monotonic() - start, ok=False)
+            logging.warning(f"Search provider {provider.name} failed for {query!r}: {e}")
+            raise
+        health.record(time.monotonic() - start, ok=True)
+        return results
 
+    def _submit(self, provider, query: str, max_results: int):
+        return self.search_pool.submit(contextvars.copy_context().run, self._call, provider, query, max_results)
+
+    @staticmethod
+    def unique(results: list, max_results: int) -> list:
+        seen = set()
+        merged = []
+        for url, snippet in results:
+            key = normalize_url(url)
+            if key not in seen:
+                seen.add(key)
+                merged.append((url, snippet))
+        return merged[:max_results]
+
+    @traced("search.fetch")
     def fetch(self, query: str, max_results: int = 3) -> list:
-        return self.api.fetch(query=query, max_results=max_results)
+        # The fastest healthy providers go first; providers with an open circuit are skipped unless none is left.
+        providers = sorted(
+            self.providers,
+            key=lambda provider: (self.health[provider.name].failures, self.health[provider.name].latency or 0.0)
+        )
+        if self.mode == "merge":
+            allowed = [provider for provider in providers if self.health[provider.name].allow()]
+            return self._merge(query, max_results, allowed or providers[:1])
+        return self._first(query, max_results, providers)
+
+    def _first(self, query: str, max_results: int, providers: list) -> list:
+        # Hedged requests: the next provider starts when the running ones are slower than usual or come back empty,
+        # and the first non-empty answer wins. Calls still running are left to finish and update their provider's health.
+        waiting = list(providers)
+        pending = set()
+        deadline = time.monotonic() + self.timeout
+        hedge_at = 0.0
+        launched = 0
+        while True:
+            now = time.monotonic()
+            if waiting and now >= hedge_at:
+                provider = waiting.pop(0)
+                if not self.health[provider.name].allow() and (waiting or launched):
+                    continue
+                launched += 1
+                if pending:
+                    tracer.count("search_hedges", provider=provider.name)
+                pending.add(self._submit(provider, query, max_results))
+                latency = self.health[provider.name].latency
+                hedge_at = now + (min(self.hedge_delay, 2 * latency) if latency else self.hedge_delay)
+            if not pending or now >= deadline:
+                break
+            done, pending = wait(pending, timeout=min(deadline, hedge_at if waiting else deadline) - now,
+                                 return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None and future.result():
+                    return self.unique(future.result(), max_results)
+                hedge_at = 0.0
+        logging.warning(f"No search results for {query!r} from {', '.join(provider.name for provider in providers)}")
+        return []
+
+    def _merge(self, query: str, max_results: int, providers: list) -> list:
+        # Every provider is queried at once; answers that arrived by the deadline are interleaved by rank.
+        futures = [self._submit(provider, query, max_results) for provider in providers]
+        done, _ = wait(futures, timeout=self.timeout)
+        rankings = [future.result() for future in futures if future in done and future.exception() is None]
+        merged = [result for results in zip_longest(*rankings) for result in results if result is not None]
+        return self.unique(merged, max_results)
+
+    def stats(self) -> dict:
+        return {name: health.stats() for name, health in self.health.items()}
 
     def scrape(self, url: str, max_chars: int = 125_000) -> str:
-        return self.api.scrape(url=url, max_chars=max_chars)
+        if self.cache is None:
+            return self.api.scrape(url=url, max_chars=max_chars)
+        content, is_stale = self.cache.get(url)
+        if content is None:
+            return self._scrape_and_store(url=url, max_chars=max_chars)
+        if is_stale and self.cache.start_refresh(url):
+            self.scrape_pool.executor.submit(self._revalidate, url, max_chars)
+        return content[:max_chars]
+
+    def _scrape_and_store(self, url: str, max_chars: int) -> str:
+        content = self.api.scrape(url=url, max_chars=max_chars)
+        if content:
+            self.cache.put(url, content)
+        return content
+
+    def _revalidate(self, url: str, max_chars: int):
+        try:
+            self._scrape_and_store(url=url, max_chars=max_chars)
+        except Exception as e:
+            logging.warning(f"Background revalidation failed for {url}: {e}")
+        finally:
+            self.cache.end_refresh(url)
+
+    def scrape_many(self, urls: list, max_chars: int = 125_000, timeout: float = BRANCH_SCRAPE_TIMEOUT) -> list:
+        return self.scrape_pool.map(
+            lambda url: self.scrape(url=url, max_chars=max_chars),
+            urls,
+            timeout=timeout
+        )
+
+class JinaReader:
+    def __init__(self, reader_url: str = JINA_READER_URL, timeout: float = SCRAPE_TIMEOUT):
+        self.reader_url = reader_url.rstrip("/")
+        self.timeout = timeout
+        self.session = create_session()
+        self.headers = {
+            "X-Retain-Images": "none",
+            "X-Return-Format": "markdown"
+        }
+        if JINA_API_KEY:
+            self.headers["Authorization"] = f"Bearer {JINA_API_KEY}"
+
+    @traced("jina.scrape")
+    def scrape(self, url: str, max_chars: int = 125_000) -> str:
+        response = self.session.get(
+            url=f"{self.reader_url}/{url}",
+            headers=self.headers,
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        return response.text[:max_chars]
+
+class LocalReader:
+    TEXT_TYPES = {"text/html", "application/xhtml+xml", "text/plain", "text/markdown"}
+
+    def __init__(self, timeout: float = SCRAPE_TIMEOUT, max_bytes: int = SCRAPE_MAX_BYTES, chunk_size: int = 16_384):
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.session = create_session()
+        self.headers = {
+            "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0 Safari/537.36",
+            "Accept": "text/html,application/xhtml+xml,text/plain;q=0.9,*/*;q=0.1"
+        }
+
+    @staticmethod
+    def decoder(content_type: str):
+        charset = "utf-8"
+        for parameter in content_type.split(";")[1:]:
+            name, _, value = parameter.partition("=")
+            if name.strip().lower() == "charset" and value.strip():
+                charset = value.strip().strip("\"'")
+        try:
+            return codecs.getincrementaldecoder(charset)(errors="replace")
+        except LookupError:
+            return codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    @traced("local.scrape")
+    def scrape(self, url: str, max_chars: int = 125_000) -> str:
+        with self.session.get(url=url, headers=self.headers, timeout=self.timeout, stream=True) as response:
+            response.raise_for_status()
+            content_type = response.headers.get("Content-Type", "text/html")
+            media_type = content_type.split(";")[0].strip().lower()
+            # Decided from the headers alone, so PDFs, images or huge files are never downloaded.
+            if media_type not in self.TEXT_TYPES:
+                logging.info(f"Skipping {url}: unsupported content type {media_type}")
+                return ""
+            if int(response.headers.get("Content-Length") or 0) > self.max_bytes:
+                logging.info(f"Skipping {url}: {response.headers['Content-Length']} bytes")
+                return ""
+            decoder = self.decoder(content_type)
+            extractor = MarkdownExtractor() if media_type in ("text/html", "application/xhtml+xml") else None
+            text = []
+            size = 0
+            received = 0
+            for chunk in response.iter_content(chunk_size=self.chunk_size):
+                received += len(chunk)
+                if extractor:
+                    extractor.feed(decoder.decode(chunk))
+                    size = extractor.size
+                else:
+                    text.append(decoder.decode(chunk))
+                    size += len(text[-1])
+                # Stops reading as soon as enough text is extracted, the rest of the body is never transferred.
+                if size >= max_chars or received >= self.max_bytes:
+                    break
+            tracer.count("local_scrape_bytes", received)
+            return (extractor.markdown() if extractor else "".join(text))[:max_chars]
 
 class DDGSearch:
-    def __init__(self):
+    name = "ddgs"
+
+    def __init__(self, reader: JinaReader | LocalReader | None = None):
         self.ddgs = DDGS()
+        self.reader = reader or JinaReader()
 
+    @traced("ddgs.fetch")
     def fetch(self, query: str, max_results: int = 3):
-        try:
-            return [(result["href"], result["body"]) for result in self.ddgs.text(query=query, max_results=max_results)]
-        except DDGSException as e:
-            logging.exception(e)
-            return []
+        return [(result["href"], result["body"]) for result in self.ddgs.text(query=query, max_results=max_results)]
 
     def scrape(self, url: str, max_chars: int = 125_000) -> str:
-        response = requests.get(
-            url=f"https://r.jina.ai/{url}",
-            headers={
-                "X-Retain-Images": "none",
-                "X-Return-Format": "markdown"
-            }
+        return self.reader.scrape(url=url, max_chars=max_chars)
+
+class SearxSearch:
+    name = "searxng"
+
+    def __init__(self, base_url: str = SEARXNG_URL, reader: JinaReader | LocalReader | None = None, timeout: float = SEARCH_TIMEOUT):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = create_session()
+        self.reader = reader or JinaReader()
+
+    @traced("searxng.fetch")
+    def fetch(self, query: str, max_results: int = 3):
+        response = self.session.get(
+            url=f"{self.base_url}/search",
+            params={"q": query, "format": "json"},
+            timeout=self.timeout
         )
-        return response.text[:max_chars]
+        response.raise_for_status()
+        return [(result["url"], result.get("content", "")) for result in response.json()["results"][:max_results]]
+
+    def scrape(self, url: str, max_chars: int = 125_000) -> str:
+        return self.reader.scrape(url=url, max_chars=max_chars)
+
+class StubSearch:
+    # Offline provider for tests and benchmarks: canned results per query, or generated ones, after a configurable
+    # latency, slow tail and failure rate.
+    def __init__(self, name: str = "stub", results: dict | None = None, latency: float = 0.0, slow_rate: float = 0.0,
+                 slow_latency: float = 30.0, failure_rate: float = 0.0, seed: int = 0,
+                 reader: JinaReader | LocalReader | None = None):
+        self.name = name
+        self.results = results
+        self.latency = latency
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.reader = reader or JinaReader()
+
+    @traced("stub.fetch")
+    def fetch(self, query: str, max_results: int = 3):
+        time.sleep(self.slow_latency if self.random.random() < self.slow_rate else self.latency)
+        if self.random.random() < self.failure_rate:
+            raise RuntimeError(f"{self.name} failed")
+        if self.results is not None:
+            return list(self.results.get(query, []))[:max_results]
+        slug = re.sub(r"\W+", "-", query.lower()).strip("-")
+        return [(f"https://{self.name}.example/{slug}/{i}", f"Result {i} for {query}") for i in range(max_results)]
+
+    def scrape(self, url: str, max_chars: int = 125_000) -> str:
+        return self.reader.scrape(url=url, max_chars=max_chars)
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class EmbeddingCache(SQLiteStore):
+    def __init__(self, path: str = os.path.join(CACHE_DIR, "embeddings.sqlite")):
+        super().__init__(path, [
+            "CREATE TABLE IF NOT EXISTS embeddings (model TEXT, text_hash TEXT, vector BLOB, PRIMARY KEY (model, text_hash))"
+        ])
+
+    def get_many(self, model: str, hashes: list) -> dict:
+        found = {}
+        with self.lock:
+            # Stay well under SQLite's bound-parameter limit.
+            for start in range(0, len(hashes), 500):
+                batch = hashes[start:start + 500]
+                rows = self.connection.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({','.join('?' * len(batch))})",
+                    (model, *batch)
+                ).fetchall()
+                found.update({key: np.frombuffer(vector, dtype=np.float32) for key, vector in rows})
+            self.hits += len(found)
+            self.misses += len(hashes) - len(found)
+        tracer.count("embedding_cache", len(found), result="hit")
+        tracer.count("embedding_cache", len(hashes) - len(found), result="miss")
+        return found
+
+    def put_many(self, model: str, vectors: dict):
+        with self.lock:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector) VALUES (?, ?, ?)",
+                [(model, key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in vectors.items()]
+            )
+
+class CachedEmbeddings(Embeddings):
+    def __init__(self, model: str = EMBEDDING_MODEL, cache: EmbeddingCache | None = None,
+                 batch_size: int = EMBEDDING_BATCH_SIZE):
+        self.model = model
+        self.embeddings = OllamaEmbeddings(model=model)
+        self.cache = cache
+        self.batch_size = batch_size
+
+    def embed_documents(self, texts: list, deadline: float | None = None) -> list:
+        hashes = [text_hash(text) for text in texts]
+        unique = dict(zip(hashes, texts))
+        vectors = self.cache.get_many(self.model, list(unique)) if self.cache else {}
+        missing = [(key, text) for key, text in unique.items() if key not in vectors]
+        for start in range(0, len(missing), self.batch_size):
+            batch = missing[start:start + self.batch_size]
+            with model_scheduler.slot(self.model, deadline), tracer.span("ollama.embed", model=self.model, texts=len(batch)):
+                embedded = dict(zip(
+                    [key for key, _ in batch],
+                    self.embeddings.embed_documents([text for _, text in batch])
+                ))
+            if self.cache:
+                self.cache.put_many(self.model, embedded)
+            vectors.update(embedded)
+        return [np.asarray(vectors[key], dtype=np.float32).tolist() for key in hashes]
+
+    def embed_query(self, text: str, deadline: float | None = None) -> list:
+        return self.embed_documents([text], deadline)[0]
+
+@lru_cache(maxsize=None)
+def shared_embedding_cache() -> EmbeddingCache:
+    return EmbeddingCache()
+
+@lru_cache(maxsize=None)
+def shared_embeddings(model: str = EMBEDDING_MODEL) -> CachedEmbeddings:
+    cache = shared_embedding_cache() if EMBEDDING_CACHE_ENABLED else None
+    return CachedEmbeddings(model=model, cache=cache)
+
+TERM_PATTERN = re.compile(r"\w{2,}")
+
+class BM25Index:
+    # In-memory inverted index over every chunk of the run, cheap enough to score chunks that are never embedded.
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(dict)
+        self.lengths = {}
+        self.documents = {}
+        self.total_length = 0
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def add(self, key: str, text: str, metadata: dict):
+        if key in self.lengths:
+            return
+        terms = Counter(TERM_PATTERN.findall(text.lower()))
+        for term, count in terms.items():
+            self.postings[term][key] = count
+        self.lengths[key] = sum(terms.values())
+        self.total_length += self.lengths[key]
+        self.documents[key] = (text, metadata)
+
+    def scores(self, query: str, keys=None) -> dict:
+        if not self.lengths:
+            return {}
+        average_length = self.total_length / len(self.lengths) or 1
+        scores = defaultdict(float)
+        for term in set(TERM_PATTERN.findall(query.lower())):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (len(self.lengths) - len(postings) + 0.5) / (len(postings) + 0.5))
+            for key, count in postings.items():
+                if keys is not None and key not in keys:
+                    continue
+                norm = 1 - self.b + self.b * self.lengths[key] / average_length
+                scores[key] += idf * count * (self.k1 + 1) / (count + self.k1 * norm)
+        return scores
+
+def reciprocal_rank_fusion(rankings: list, k: int = RRF_K) -> list:
+    scores = defaultdict(float)
+    documents = {}
+    for ranking in rankings:
+        for rank, document in enumerate(ranking):
+            key = document.metadata["chunk_hash"]
+            scores[key] += 1 / (k + rank + 1)
+            documents.setdefault(key, document)
+    return [documents[key] for key in sorted(scores, key=scores.get, reverse=True)]
 
-def create_vector_store(web_pages: list, snippets_size: int = 5000):
-    urls, contents = zip(*[(page["url"], page["content"]) for page in web_pages])
+class BlobStore:
+    # Run-scoped, content-addressed page bodies on disk. The graph state only carries the content hashes,
+    # so checkpoints and Send payloads stay small however many pages a run scrapes.
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
 
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=snippets_size,
-        chunk_overlap=150,
-        separators=["\n\n", "\n", " ", ""]
-    )
-    all_chunks = []
-    all_metadata = []
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
 
-    for url, page in zip(urls, contents):
-        if not page or len(page) < 10:
+    def put(self, content: str) -> str:
+        key = text_hash(content)
+        path = self.path(key)
+        if not os.path.exists(path):
+            temporary = f"{path}.{threading.get_ident()}.tmp"
+            with open(temporary, "wb") as f:
+                f.write(zlib.compress(content.encode("utf-8")))
+            os.replace(temporary, path)
+        return key
+
+    def get(self, key: str) -> str | None:
+        try:
+            with open(self.path(key), "rb") as f:
+                return zlib.decompress(f.read()).decode("utf-8")
+        except FileNotFoundError:
+            return None
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+def get_blob_store(run_id: str) -> BlobStore:
+    return BlobStore(os.path.join(BLOB_DIR, run_id))
+
+def release_blob_store(run_id: str):
+    get_blob_store(run_id).clear()
+
+def sweep_blob_stores(max_age: float = BLOB_MAX_AGE):
+    # Interrupted runs keep their page bodies so they can be resumed, until they are older than max_age.
+    if not os.path.isdir(BLOB_DIR):
+        return
+    now = time.time()
+    for name in os.listdir(BLOB_DIR):
+        path = os.path.join(BLOB_DIR, name)
+        try:
+            if now - os.path.getmtime(path) > max_age:
+                shutil.rmtree(path, ignore_errors=True)
+        except FileNotFoundError:
             continue
 
-        chunks = splitter.split_text(page)
-        all_chunks.extend(chunks)
-        all_metadata.extend([{"url": url} for _ in chunks])
-
-    embeddings = OllamaEmbeddings(model="nomic-embed-text")
-
-    vector_store = FAISS.from_texts(
-        texts=all_chunks,
-        embedding=embeddings,
-        metadatas=all_metadata
-    )
-    return vector_store
-
-def get_top_k(query: str, vector_store: FAISS, k: int = 5):
-    reranker = FlashrankRerank(top_n=k)
-    base_retriever = vector_store.as_retriever(search_kwargs={"k": k*5})
-    compressor_retriever = ContextualCompressionRetriever(
-        base_compressor=reranker,
-        base_retriever=base_retriever
-    )
-    return compressor_retriever.invoke(query)
+class RunIndex:
+    def __init__(self, snippets_size: int = 5000, embeddings: Embeddings | None = None,
+                 hnsw_threshold: int = HNSW_THRESHOLD, near_duplicates: bool = NEAR_DUPLICATES_ENABLED,
+                 prefilter: str = PREFILTER, prefilter_fraction: float = PREFILTER_FRACTION,
+                 prefilter_min_chunks: int = PREFILTER_MIN_CHUNKS, run_id: str | None = None):
+        self.run_id = run_id
+        self.splitter = RecursiveCharacterTextSplitter(
+            chunk_size=snippets_size,
+            chunk_overlap=150,
+            separators=["\n\n", "\n", " ", ""]
+        )
+        self.embeddings = embeddings or shared_embeddings()
+        self.hnsw_threshold = hnsw_threshold
+        self.vector_store = None
+        self.chunk_hashes = set()
+        self.claimed = set()
+        self.urls = set()
+        self.near_duplicates = near_duplicates
+        self.page_fingerprints = SimHashIndex()
+        self.chunk_fingerprints = SimHashIndex()
+        self.prefilter = prefilter
+        self.prefilter_fraction = prefilter_fraction
+        self.prefilter_min_chunks = prefilter_min_chunks
+        self.lexical = BM25Index()
+        self.lock = threading.Lock()
+        self.restore_lock = threading.Lock()
+        self.restored = False
+
+    def __len__(self):
+        return len(self.chunk_hashes)
+
+    def reserve_urls(self, urls: list) -> list:
+        # Single-flight across the run's parallel branches: only the first branch to ask for a URL scrapes it.
+        with self.lock:
+            reserved = []
+            for url in urls:
+                key = normalize_url(url)
+                if key not in self.urls:
+                    self.urls.add(key)
+                    reserved.append(url)
+        tracer.count("urls_already_reserved", len(urls) - len(reserved))
+        return reserved
+
+    def release_urls(self, urls: list):
+        # URLs that could not be scraped are given back, so a later iteration or a sibling branch can try again.
+        with self.lock:
+            self.urls.difference_update(normalize_url(url) for url in urls)
+
+    def unique(self, items: list, fingerprints: SimHashIndex) -> list:
+        # Fingerprints are computed outside the lock, then checked and recorded atomically so two branches
+        # adding copies of the same article at once keep only one of them.
+        if not self.near_duplicates:
+            return [item for _, item in items]
+        keyed = [(simhash(text), item) for text, item in items]
+        with self.lock:
+            return [item for fingerprint, item in keyed if fingerprints.add_if_new(fingerprint)]
+
+    def prefiltered(self, chunks: dict, queries: list) -> dict:
+        # Only the chunks that score best lexically against the queries are embedded, the rest stay reachable
+        # through lexical_search.
+        keep = max(self.prefilter_min_chunks, math.ceil(len(chunks) * self.prefilter_fraction))
+        if self.prefilter != "bm25" or not queries or len(chunks) <= keep:
+            return chunks
+        scores = self.lexical.scores(" ".join(queries), keys=chunks.keys())
+        best = heapq.nlargest(keep, chunks, key=lambda key: scores.get(key, 0.0))
+        tracer.count("prefilter_skipped_chunks", len(chunks) - keep)
+        return {key: chunks[key] for key in best}
+
+    def restore(self, references: list, blob_store: BlobStore, claimed: list = (), queries: list | None = None,
+                deadline: float | None = None) -> int:
+        # A resumed run starts with an empty in-memory index: the first branch to get here rebuilds it from the
+        # page bodies that the checkpointed state points to, and its siblings wait until it is done. The chunks
+        # that were already summarized are claimed again so they are not summarized twice.
+        with self.restore_lock:
+            if self.restored:
+                return 0
+            if not references:
+                self.restored = True
+                return 0
+            with self.lock:
+                self.urls.update(normalize_url(reference["url"]) for reference in references)
+                self.claimed.update(claimed)
+            pages = [
+                {"url": reference["url"], "content": blob_store.get(reference["content_hash"])}
+                for reference in references if reference.get("content_hash")
+            ]
+            logging.info(f"Restoring the run index from {len(pages)} stored pages")
+            added = self.add_pages([page for page in pages if page["content"]], queries=queries, deadline=deadline)
+            self.restored = True
+            return added
+
+    @traced("index.add_pages")
+    def add_pages(self, web_pages: list, queries: list | None = None, deadline: float | None = None) -> int:
+        pages = [(page["content"], page) for page in web_pages if page["content"] and len(page["content"]) >= 10]
+        unique_pages = self.unique(pages, self.page_fingerprints)
+        chunks = {}
+        for page in unique_pages:
+            for chunk in self.splitter.split_text(page["content"]):
+                chunks.setdefault(text_hash(chunk), (chunk, {"url": page["url"]}))
+        with self.lock:
+            chunks = {key: value for key, value in chunks.items() if key not in self.chunk_hashes}
+        unique_keys = set(self.unique([(text, key) for key, (text, _) in chunks.items()], self.chunk_fingerprints))
+        tracer.count("near_duplicate_pages", len(pages) - len(unique_pages))
+        tracer.count("near_duplicate_chunks", len(chunks) - len(unique_keys))
+        chunks = {key: value for key, value in chunks.items() if key in unique_keys}
+        if self.prefilter == "bm25":
+            with self.lock:
+                for key, (text, metadata) in chunks.items():
+                    self.lexical.add(key, text, {**metadata, "chunk_hash": key})
+                chunks = self.prefiltered(chunks, queries)
+        if not chunks:
+            return 0
+
+        texts = [text for text, _ in chunks.values()]
+        try:
+            vectors = self.embeddings.embed_documents(texts, deadline)
+        except TimeoutError as e:
+            # The chunks stay reachable through lexical_search when the prefilter indexed them.
+            logging.info(f"Not embedding {len(texts)} chunks: {e}")
+            return 0
+        with self.lock:
+            # Another branch may have added some of these chunks while we were embedding.
+            new = [
+                (key, text, vector, {**metadata, "chunk_hash": key})
+                for (key, (text, metadata)), vector in zip(chunks.items(), vectors)
+                if key not in self.chunk_hashes
+            ]
+            if not new:
+                return 0
+            text_embeddings = [(text, vector) for _, text, vector, _ in new]
+            metadatas = [metadata for _, _, _, metadata in new]
+            if self.vector_store is None:
+                self.vector_store = FAISS.from_embeddings(
+                    text_embeddings=text_embeddings,
+                    embedding=self.embeddings,
+                    metadatas=metadatas
+                )
+            else:
+                self.vector_store.add_embeddings(text_embeddings=text_embeddings, metadatas=metadatas)
+            self.chunk_hashes.update(key for key, _, _, _ in new)
+            self._maybe_use_hnsw()
+        return len(new)
+
+    def _maybe_use_hnsw(self):
+        index = self.vector_store.index
+        if not self.hnsw_threshold or not isinstance(index, faiss.IndexFlat) or index.ntotal < self.hnsw_threshold:
+            return
+        logging.info(f"Switching run index to HNSW at {index.ntotal} chunks")
+        hnsw = faiss.IndexHNSWFlat(index.d, HNSW_M)
+        hnsw.hnsw.efSearch = HNSW_EF_SEARCH
+        hnsw.add(index.reconstruct_n(0, index.ntotal))
+        self.vector_store.index = hnsw
+
+    @traced("faiss.search")
+    def search(self, query: str, k: int, exclude_claimed: bool = True, deadline: float | None = None) -> list:
+        try:
+            query_vector = self.embeddings.embed_query(query, deadline)
+        except TimeoutError as e:
+            logging.info(f"Falling back to lexical search: {e}")
+            return []
+        with self.lock:
+            if self.vector_store is None:
+                return []
+            claimed = set(self.claimed) if exclude_claimed else set()
+            results = self.vector_store.similarity_search_by_vector(
+                query_vector,
+                k=k,
+                filter=lambda metadata: metadata["chunk_hash"] not in claimed,
+                fetch_k=k + len(claimed)
+            )
+        return results
+
+    @traced("bm25.search")
+    def lexical_search(self, query: str, k: int, exclude_claimed: bool = True) -> list:
+        with self.lock:
+            claimed = self.claimed if exclude_claimed else set()
+            scores = self.lexical.scores(query)
+            best = heapq.nlargest(k, (key for key in scores if key not in claimed), key=scores.get)
+            return [Document(page_content=self.lexical.documents[key][0], metadata=self.lexical.documents[key][1])
+                    for key in best]
+
+    def claim(self, documents: list, k: int) -> list:
+        # Chunks are summarized once per run, whichever branch or iteration retrieves them first. Taking the
+        # first k unclaimed ones of the ranked list under the lock means a branch that lost some of its best
+        # chunks to a sibling still gets k snippets, from further down its own ranking.
+        with self.lock:
+            claimed = []
+            for document in documents:
+                key = document.metadata["chunk_hash"]
+                if key not in self.claimed:
+                    self.claimed.add(key)
+                    claimed.append(document)
+                    if len(claimed) >= k:
+                        break
+        return claimed
+
+run_indexes = {}
+run_indexes_lock = threading.Lock()
+
+def get_run_index(run_id: str) -> RunIndex:
+    with run_indexes_lock:
+        if run_id not in run_indexes:
+            run_indexes[run_id] = RunIndex(run_id=run_id)
+        return run_indexes[run_id]
+
+def release_run_index(run_id: str):
+    with run_indexes_lock:
+        run_indexes.pop(run_id, None)
+
+def get_top_k(query: str, index: RunIndex, k: int = 5, deadline: float | None = None):
+    # Returns all k*5 candidates in ranked order rather than the first k, so RunIndex.claim can pick the
+    # best k that concurrent branches have not taken yet.
+    candidates = index.search(query, k=k*5, deadline=deadline)
+    if index.prefilter == "bm25":
+        # Hybrid retrieval: chunks the prefilter did not embed can still win on lexical rank.
+        candidates = reciprocal_rank_fusion([candidates, index.lexical_search(query, k=k*5)])[:k*5]
+    if not candidates:
+        return []
+    if RERANKER == "none":
+        return candidates
+    return shared_reranker().rerank(query, candidates, k=len(candidates), run_id=index.run_id)
 
 def save_report(user_query: str, report: str, file_name: str):
     file = f"[USER QUERY]: {user_query}\n\n[REPORT]: {report}"
@@ -0,0 +1,34 @@
+"""The LLM response cache must key on the model and its sampling options, not just the prompt.
+
+    python -m pytest tests
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from llm import CachedChatOllama, SQLiteLLMCache
+
+FORMAT = {"type": "object", "properties": {"report": {"type": "string"}}}
+
+def cache_key(**options) -> str:
+    llm = CachedChatOllama(**{"model": "qwen3:14b", "num_ctx": 8192, "num_predict": 4096, **options})
+    return SQLiteLLMCache._key("prompt", llm._get_llm_string(format=FORMAT))
+
+def test_seeds_and_temperatures_get_their_own_entries():
+    assert cache_key(seed=0, temperature=0.2) != cache_key(seed=1, temperature=0.2)
+    assert cache_key(seed=0, temperature=0.2) != cache_key(seed=0, temperature=0.8)
+
+def test_models_and_generation_limits_get_their_own_entries():
+    assert cache_key() != cache_key(model="qwen3:8b")
+    assert cache_key() != cache_key(num_ctx=4096)
+    assert cache_key() != cache_key(num_predict=256)
+
+def test_keep_alive_and_client_settings_share_an_entry():
+    assert cache_key() == cache_key(keep_alive="30m")
+    assert cache_key() == cache_key(sync_client_kwargs={"timeout": 120})
+
+def test_copies_of_a_model_keep_its_key():
+    llm = CachedChatOllama(model="qwen3:14b", seed=3)
+    assert llm.model_copy(update={"cache": False})._get_llm_string() == llm._get_llm_string()
+    assert llm.model_copy(update={"seed": 4})._get_llm_string() != llm._get_llm_string()